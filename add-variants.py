@@ -5,11 +5,122 @@
 
 import argparse
 import gzip
-import json
+import io
+import itertools
+import multiprocessing
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from decimal import Decimal
-from typing import Any, Dict, Iterable, List
+from types import ModuleType
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Sequence, Tuple
 import ijson
+import orjson
 import duckdb
+import pyarrow as pa
+from workflow_agents.variant_summary import clinvar_summary, transcripts_summary
+
+try:
+    from isal import igzip, isal_zlib
+except ImportError:  # python-isal is optional; fall back to the standard library
+    igzip = None
+    isal_zlib = None
+
+# gzip magic, deflate, FEXTRA flag: the fixed start of every BGZF block header.
+BGZF_MAGIC = b"\x1f\x8b\x08\x04"
+
+# Arrow types for the columns written to the variants table, in insert order.
+VARIANT_ARROW_TYPES = {
+    "chromosome": pa.string(),
+    "vid": pa.string(),
+    "variant_index": pa.int32(),
+    "position": pa.int32(),
+    "quality": pa.float64(),
+    "begin_pos": pa.int32(),
+    "end_pos": pa.int32(),
+    "ref_allele": pa.string(),
+    "alt_allele": pa.string(),
+    "genotype": pa.string(),
+    "genotype_quality": pa.float64(),
+    "total_depth": pa.int32(),
+    "allele_depths": pa.list_(pa.int32()),
+    "paternal_genotype": pa.string(),
+    "maternal_genotype": pa.string(),
+    "variant_type": pa.string(),
+    "gene_symbols": pa.list_(pa.string()),
+    "canonical_transcripts": pa.list_(pa.string()),
+    "transcript_consequences": pa.list_(pa.string()),
+    "gnomad_af": pa.float64(),
+    "clinvar_classifications": pa.list_(pa.string()),
+    "raw": pa.string(),
+}
+VARIANT_COLUMNS = list(VARIANT_ARROW_TYPES)
+
+# Compressed full JSON, stored in variant_raw with --raw-storage separate.
+RAW_BLOB_COLUMN = "raw_blob"
+VARIANT_ARROW_TYPES[RAW_BLOB_COLUMN] = pa.binary()
+
+# Display text precomputed at ingest and stored in variant_summaries.
+SUMMARY_COLUMNS = ["clinvar_summary", "transcripts_summary"]
+VARIANT_ARROW_TYPES.update({column: pa.string() for column in SUMMARY_COLUMNS})
+
+# Record columns that are written to side tables rather than to variants.
+SIDE_COLUMNS = {RAW_BLOB_COLUMN, *SUMMARY_COLUMNS}
+
+RAW_STORAGE_MODES = ["full", "slim", "separate"]
+
+# Arrow types for rows of the genotypes table used in cohort mode.
+GENOTYPE_ARROW_TYPES = {
+    "case_id": pa.string(),
+    "sample_id": pa.string(),
+    "sample_role": pa.string(),
+    "vid": pa.string(),
+    "chromosome": pa.string(),
+    "genotype": pa.string(),
+    "genotype_quality": pa.float64(),
+    "total_depth": pa.int32(),
+    "allele_depths": pa.list_(pa.int32()),
+}
+GENOTYPE_COLUMNS = list(GENOTYPE_ARROW_TYPES)
+
+# Role of each sample column when no pedigree or mapping is given.
+DEFAULT_SAMPLE_ROLES = ["proband", "father", "mother"]
+OTHER_SAMPLE_ROLE = "relative"
+
+# ijson backends, fastest first; "auto" picks the first one that imports.
+PARSER_BACKENDS = ["yajl2_c", "yajl2_cffi", "yajl2", "python"]
+
+# Fields read by the variant agent's transcript and ClinVar summaries.
+SLIM_TRANSCRIPT_KEYS = ("hgnc", "transcript", "consequence", "hgvsc")
+SLIM_CLINVAR_KEYS = (
+    "accession",
+    "refAllele",
+    "altAllele",
+    "isAlleleSpecific",
+    "reviewStatus",
+)
+SLIM_CLASSIFICATION_KEYS = ("classification", "conditions")
+
+# Consequence classes counted in gene_variant_summary, most severe first; each
+# variant is counted in the first class any of its consequences falls in.
+CONSEQUENCE_CLASSES = {
+    "lof": [
+        "frameshift_variant",
+        "stop_gained",
+        "splice_acceptor_variant",
+        "splice_donor_variant",
+        "start_lost",
+        "stop_lost",
+    ],
+    "missense_inframe": ["missense_variant", "inframe_deletion", "inframe_insertion"],
+    "splice_region": ["splice_region_variant"],
+    "synonymous": ["synonymous_variant", "stop_retained_variant"],
+}
+
+# gnomAD allele frequency buckets as (label, upper bound), lowest first.
+AF_BUCKETS = [("<0.001", 0.001), ("0.001-0.01", 0.01), ("0.01-0.05", 0.05)]
 
 
 def decimal_default(obj: Any):
@@ -19,12 +130,145 @@ def decimal_default(obj: Any):
     raise TypeError
 
 
-def stream_positions(json_gz_path: str) -> Iterable[Dict[str, Any]]:
+def is_bgzf(path: str) -> bool:
+    """Return True if the file starts with a BGZF (blocked gzip) header."""
+    with open(path, "rb") as f:
+        header = f.read(18)
+    return (
+        len(header) == 18 and header[:4] == BGZF_MAGIC and header[12:14] == b"BC"
+    )
+
+
+class BGZFReader(io.RawIOBase):
+    """
+    Read a BGZF file, inflating its independent blocks on a thread pool.
+
+    zlib (and isal) release the GIL while inflating, so blocks decompress in
+    parallel while the caller consumes them in file order.
+    """
+
+    def __init__(self, path: str, threads: int):
+        super().__init__()
+        self._file = open(path, "rb")  # pylint: disable=consider-using-with
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+        self._pending = deque()
+        self._max_pending = threads * 4
+        self._buffer = memoryview(b"")
+        self._eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def _read_block(self) -> bytes | None:
+        """Read the next compressed block, including its CRC32/ISIZE trailer."""
+        header = self._file.read(12)
+        if not header:
+            return None
+        if len(header) < 12 or header[:4] != BGZF_MAGIC:
+            raise OSError("Invalid BGZF block header")
+        (xlen,) = struct.unpack("<H", header[10:12])
+        extra = self._file.read(xlen)
+        block_size = None
+        offset = 0
+        while offset + 4 <= len(extra):
+            (subfield_length,) = struct.unpack("<H", extra[offset + 2 : offset + 4])
+            if extra[offset : offset + 2] == b"BC":
+                (block_size,) = struct.unpack("<H", extra[offset + 4 : offset + 6])
+            offset += 4 + subfield_length
+        if block_size is None:
+            raise OSError("BGZF block is missing its BC subfield")
+        return self._file.read(block_size + 1 - 12 - xlen)
+
+    @staticmethod
+    def _inflate(block: bytes) -> bytes:
+        """Decompress one block and check it against its trailer."""
+        inflate = isal_zlib.decompress if isal_zlib else zlib.decompress
+        data = inflate(block[:-8], -15)
+        crc, size = struct.unpack("<II", block[-8:])
+        if zlib.crc32(data) != crc or len(data) != size:
+            raise OSError("BGZF block failed its CRC check")
+        return data
+
+    def _fill(self):
+        """Keep up to `_max_pending` blocks decompressing ahead of the reader."""
+        while not self._eof and len(self._pending) < self._max_pending:
+            block = self._read_block()
+            if block is None:
+                self._eof = True
+                break
+            self._pending.append(self._executor.submit(self._inflate, block))
+
+    def readinto(self, buffer) -> int:
+        while not self._buffer:
+            self._fill()
+            if not self._pending:
+                return 0
+            self._buffer = memoryview(self._pending.popleft().result())
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            for future in self._pending:
+                future.cancel()
+            self._executor.shutdown(wait=True)
+            self._file.close()
+        super().close()
+
+
+def open_nirvana(json_gz_path: str, threads: int = 1) -> BinaryIO:
+    """
+    Open a gzipped Nirvana JSON file for binary reading. BGZF files are
+    decompressed block-parallel when `threads` > 1; otherwise isal's igzip is
+    used when installed, and the standard-library gzip module as a fallback.
+    """
+    if threads > 1 and is_bgzf(json_gz_path):
+        return io.BufferedReader(BGZFReader(json_gz_path, threads), 1 << 20)
+    if igzip is not None:
+        return igzip.open(json_gz_path, "rb")
+    return gzip.open(json_gz_path, "rb")
+
+
+def describe_decompression(json_gz_path: str, threads: int = 1) -> str:
+    """Describe how open_nirvana will decompress a file."""
+    if threads > 1 and is_bgzf(json_gz_path):
+        inflater = "isal" if isal_zlib else "zlib"
+        return f"BGZF, {threads} threads ({inflater})"
+    return "gzip (isal)" if igzip is not None else "gzip (zlib)"
+
+
+def dump_json(obj: Any) -> str:
+    """Serialize an object to JSON text with orjson."""
+    return orjson.dumps(obj, default=decimal_default).decode("utf-8")
+
+
+def load_parser_backend(parser: str = "auto") -> Tuple[str, ModuleType]:
+    """
+    Return the name and module of the requested ijson backend. "auto" selects
+    the fastest backend available, preferring the C extension.
+    """
+    if parser != "auto":
+        return parser, ijson.get_backend(parser)
+    for name in PARSER_BACKENDS:
+        try:
+            return name, ijson.get_backend(name)
+        except ImportError:
+            continue
+    raise ImportError("No ijson backend is available")
+
+
+def stream_positions(
+    json_gz_path: str, parser: str = "auto", threads: int = 1
+) -> Iterable[Dict[str, Any]]:
     """
-    Stream position objects from a gzipped JSON file.
+    Stream position objects from a gzipped JSON file. Numbers are parsed as
+    floats rather than Decimal.
     """
-    with gzip.open(json_gz_path, "rb") as f:
-        yield from ijson.items(f, "positions.item")
+    _, backend = load_parser_backend(parser)
+    with open_nirvana(json_gz_path, threads) as f:
+        yield from backend.items(f, "positions.item", use_float=True)
 
 
 def create_variant_table(conn: duckdb.DuckDBPyConnection):
@@ -63,64 +307,915 @@ def create_variant_table(conn: duckdb.DuckDBPyConnection):
     )
 
 
-def create_mapping_tables(conn: duckdb.DuckDBPyConnection):
-    """Create mapping tables for variants."""
+def create_cohort_tables(conn: duckdb.DuckDBPyConnection):
+    """Ensure the per-case genotype and sample tables used in cohort mode exist."""
     conn.execute(
         """
-        DROP TABLE IF EXISTS variant_genes;
-        CREATE TABLE variant_genes AS
-        SELECT
-        vid,
-        chromosome,
-        UNNEST(gene_symbols) AS gene_symbol
-        FROM variants
-        WHERE gene_symbols IS NOT NULL;
+        CREATE TABLE IF NOT EXISTS case_samples (
+            case_id     VARCHAR NOT NULL,
+            sample_id   VARCHAR NOT NULL,
+            sample_role VARCHAR NOT NULL,
+            PRIMARY KEY (case_id, sample_id)
+        );
 
-        CREATE INDEX vg_gene_idx ON variant_genes(gene_symbol);
-        CREATE INDEX vg_vid_chr_idx ON variant_genes(vid, chromosome);
+        CREATE TABLE IF NOT EXISTS genotypes (
+            case_id          VARCHAR NOT NULL,
+            sample_id        VARCHAR NOT NULL,
+            sample_role      VARCHAR NOT NULL,
+            vid              VARCHAR NOT NULL,
+            chromosome       VARCHAR NOT NULL,
+            genotype         VARCHAR,
+            genotype_quality DOUBLE,
+            total_depth      INTEGER,
+            allele_depths    INTEGER[],
+            PRIMARY KEY (case_id, sample_id, vid, chromosome)
+        );
 
-        DROP TABLE IF EXISTS variant_consequences;
-        CREATE TABLE variant_consequences AS
+        CREATE INDEX IF NOT EXISTS gt_case_role_idx ON genotypes(case_id, sample_role);
+        CREATE INDEX IF NOT EXISTS gt_vid_chr_idx ON genotypes(vid, chromosome);
+        """
+    )
+
+
+def save_case_samples(
+    conn: duckdb.DuckDBPyConnection,
+    case_id: str,
+    sample_ids: Sequence[str],
+    sample_roles: Sequence[str],
+):
+    """Record the sample roles of a case."""
+    conn.executemany(
+        "INSERT OR REPLACE INTO case_samples VALUES (?, ?, ?)",
+        [[case_id, sample, role] for sample, role in zip(sample_ids, sample_roles)],
+    )
+
+
+def sql_literal(value: str) -> str:
+    """Quote a string as a SQL literal, for statements that cannot take parameters."""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def export_parquet(
+    conn: duckdb.DuckDBPyConnection,
+    parquet_dir: str,
+    case_id: str,
+    cohort: bool = False,
+):
+    """
+    Write a case's variants, mapping and summary tables as Hive-partitioned
+    Parquet under `parquet_dir`, partitioned by case_id and chromosome. Each
+    table is sorted by the column it is looked up by (variants by position,
+    variant_genes by gene symbol, and so on), so row-group min/max statistics
+    on that column let DuckDB skip row groups on filtered reads.
+
+    Cohort cases are written in the single-case layout, with the proband's call
+    and the parents' genotypes in the variant rows.
+    """
+    os.makedirs(parquet_dir, exist_ok=True)
+    case = sql_literal(case_id)
+    if cohort:
+        variants_query = f"""
+            SELECT
+                {case} AS case_id,
+                v.* EXCLUDE (
+                    genotype, genotype_quality, total_depth, allele_depths,
+                    maternal_genotype, paternal_genotype
+                ),
+                p.genotype,
+                p.genotype_quality,
+                p.total_depth,
+                p.allele_depths,
+                m.genotype AS maternal_genotype,
+                f.genotype AS paternal_genotype
+            FROM variants v
+            JOIN genotypes p
+                ON p.case_id = {case} AND p.sample_role = 'proband'
+                AND p.vid = v.vid AND p.chromosome = v.chromosome
+            LEFT JOIN genotypes f
+                ON f.case_id = {case} AND f.sample_role = 'father'
+                AND f.vid = v.vid AND f.chromosome = v.chromosome
+            LEFT JOIN genotypes m
+                ON m.case_id = {case} AND m.sample_role = 'mother'
+                AND m.vid = v.vid AND m.chromosome = v.chromosome
+        """
+        case_filter = f"""
+            SEMI JOIN genotypes p
+                ON p.case_id = {case} AND p.sample_role = 'proband'
+                AND p.vid = t.vid AND p.chromosome = t.chromosome
+        """
+    else:
+        variants_query = f"SELECT {case} AS case_id, v.* FROM variants v"
+        case_filter = ""
+
+    options = (
+        "FORMAT PARQUET, PARTITION_BY (case_id, chromosome), "
+        "ROW_GROUP_SIZE 100000, COMPRESSION ZSTD, OVERWRITE_OR_IGNORE"
+    )
+    target = sql_literal(os.path.join(parquet_dir, "variants"))
+    conn.execute(
+        f"""
+        COPY (
+            SELECT * FROM ({variants_query})
+            ORDER BY chromosome, begin_pos, variant_index
+        ) TO {target} ({options})
+        """
+    )
+    for table, sort_key in [
+        ("variant_genes", "gene_symbol"),
+        ("variant_consequences", "consequence"),
+        ("clinvar_classifications", "classification"),
+        ("variant_summaries", "vid"),
+    ]:
+        target = sql_literal(os.path.join(parquet_dir, table))
+        conn.execute(
+            f"""
+            COPY (
+                SELECT {case} AS case_id, t.* FROM {table} t {case_filter}
+                ORDER BY t.{sort_key}, t.vid
+            ) TO {target} ({options})
+            """
+        )
+
+    # The gene rollup has no chromosome column, so it is partitioned by case only
+    target = sql_literal(os.path.join(parquet_dir, "gene_variant_summary"))
+    summary_case = f"case_id = {case}" if cohort else "case_id IS NULL"
+    conn.execute(
+        f"""
+        COPY (
+            SELECT {case} AS case_id, * EXCLUDE (case_id)
+            FROM gene_variant_summary
+            WHERE {summary_case}
+            ORDER BY gene_symbol
+        ) TO {target} ({options.replace(", chromosome", "")})
+        """
+    )
+
+
+def create_raw_table(conn: duckdb.DuckDBPyConnection):
+    """Ensure the table holding compressed full variant JSON exists."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS variant_raw (
+            vid        VARCHAR NOT NULL,
+            chromosome VARCHAR NOT NULL,
+            raw        BLOB NOT NULL,
+            PRIMARY KEY (vid, chromosome)
+        );
+        """
+    )
+
+
+def create_summary_table(conn: duckdb.DuckDBPyConnection):
+    """
+    Ensure the table of precomputed variant display summaries exists. When it
+    is created in a database that already holds variants, their summaries are
+    computed from the raw JSON so no variant is left without one.
+    """
+    exists = conn.execute(
+        "SELECT count(*) FROM duckdb_tables() WHERE table_name = 'variant_summaries'"
+    ).fetchone()[0]
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS variant_summaries (
+            vid                 VARCHAR NOT NULL,
+            chromosome          VARCHAR NOT NULL,
+            clinvar_summary     VARCHAR NOT NULL,
+            transcripts_summary VARCHAR NOT NULL,
+            PRIMARY KEY (vid, chromosome)
+        );
+        """
+    )
+    if not exists:
+        insert_missing_summaries(conn)
+
+
+def insert_missing_summaries(conn: duckdb.DuckDBPyConnection, batch_size: int = 5000):
+    """Compute the summaries of variants that have none from their raw JSON."""
+    reader = conn.cursor()
+    reader.execute(
+        """
+        SELECT v.vid, v.chromosome, v.raw
+        FROM variants v
+        ANTI JOIN variant_summaries s
+            ON s.vid = v.vid AND s.chromosome = v.chromosome
+        """
+    )
+    while rows := reader.fetchmany(batch_size):
+        summaries = []
+        for vid, chromosome, raw in rows:
+            variant = orjson.loads(raw)
+            summaries.append(
+                (
+                    vid,
+                    chromosome,
+                    clinvar_summary(variant),
+                    transcripts_summary(variant),
+                )
+            )
+        conn.executemany(
+            "INSERT INTO variant_summaries VALUES (?, ?, ?, ?)", summaries
+        )
+    reader.close()
+
+
+def rebuild_summary_table(conn: duckdb.DuckDBPyConnection):
+    """Recompute the summaries of every variant from its raw JSON."""
+    conn.execute("DROP TABLE IF EXISTS variant_summaries;")
+    create_summary_table(conn)
+
+
+def gene_summary_query(
+    cohort: bool, case_filter: bool = False, gene_filter: bool = False
+) -> str:
+    """
+    SELECT of gene_variant_summary rows: per gene (and per case in a cohort),
+    the number of variants by consequence class, ClinVar class and gnomAD
+    allele frequency bucket. `case_filter` limits it to the case bound to
+    $case_id, and `gene_filter` to the genes in the touched_genes table.
+    """
+    consequence_class = "CASE\n"
+    for name, consequences in CONSEQUENCE_CLASSES.items():
+        values = ", ".join(sql_literal(c) for c in consequences)
+        consequence_class += (
+            f"WHEN list_has_any(v.transcript_consequences, [{values}]) "
+            f"THEN '{name}'\n"
+        )
+    consequence_class += "ELSE 'other' END"
+    af_bucket = "CASE WHEN v.gnomad_af IS NULL THEN 'absent'\n"
+    for label, upper in AF_BUCKETS:
+        af_bucket += f"WHEN v.gnomad_af < {upper} THEN '{label}'\n"
+    af_bucket += f"ELSE '>={AF_BUCKETS[-1][1]}' END"
+
+    if cohort:
+        case_column = "p.case_id"
+        case_join = f"""
+            JOIN genotypes p
+                ON p.sample_role = 'proband'
+                AND p.vid = v.vid AND p.chromosome = v.chromosome
+                {"AND p.case_id = $case_id" if case_filter else ""}
+        """
+    else:
+        case_column = "NULL::VARCHAR"
+        case_join = ""
+    variant_filter = ""
+    gene_symbol_filter = ""
+    if gene_filter:
+        variant_filter = """
+            AND EXISTS (
+                SELECT 1
+                FROM variant_genes g
+                JOIN touched_genes t ON t.gene_symbol = g.gene_symbol
+                WHERE g.vid = v.vid AND g.chromosome = v.chromosome
+            )
+        """
+        gene_symbol_filter = (
+            "WHERE gene_symbol IN (SELECT gene_symbol FROM touched_genes)"
+        )
+
+    return f"""
+        WITH classified AS (
+            SELECT
+                {case_column} AS case_id,
+                UNNEST(list_distinct(v.gene_symbols)) AS gene_symbol,
+                {consequence_class} AS consequence_class,
+                CASE
+                    WHEN len(list_filter(
+                        v.clinvar_classifications,
+                        c -> c LIKE 'Pathogenic%' OR c LIKE 'Likely pathogenic%'
+                    )) > 0 THEN 'pathogenic'
+                    WHEN len(list_filter(
+                        v.clinvar_classifications, c -> c LIKE 'Conflicting%'
+                    )) > 0 THEN 'conflicting'
+                    WHEN len(list_filter(
+                        v.clinvar_classifications, c -> c LIKE 'Uncertain%'
+                    )) > 0 THEN 'uncertain'
+                    WHEN len(list_filter(
+                        v.clinvar_classifications,
+                        c -> c LIKE 'Benign%' OR c = 'Likely benign'
+                    )) > 0 THEN 'benign'
+                    WHEN len(v.clinvar_classifications) > 0 THEN 'other'
+                    ELSE 'none'
+                END AS clinvar_class,
+                {af_bucket} AS af_bucket
+            FROM variants v
+            {case_join}
+            WHERE v.gene_symbols IS NOT NULL
+            {variant_filter}
+        )
         SELECT
-        vid,
-        chromosome,
-        UNNEST(transcript_consequences) AS consequence
-        FROM variants
-        WHERE transcript_consequences IS NOT NULL;
+            case_id,
+            gene_symbol,
+            consequence_class,
+            clinvar_class,
+            af_bucket,
+            count(*) AS variant_count
+        FROM classified
+        {gene_symbol_filter}
+        GROUP BY ALL
+    """
+
+
+def rebuild_gene_summary_table(conn: duckdb.DuckDBPyConnection, cohort: bool):
+    """Recompute gene_variant_summary from every variant and case."""
+    conn.execute(
+        f"""
+        CREATE OR REPLACE TABLE gene_variant_summary AS
+        {gene_summary_query(cohort)}
+        ORDER BY case_id, gene_symbol
+        """
+    )
+
+
+def update_gene_summary_table(
+    conn: duckdb.DuckDBPyConnection,
+    case_id: str | None,
+    genes: Iterable[str] | None = None,
+):
+    """
+    Recompute the gene_variant_summary rows of the loaded case (case_id None
+    for a single-case database): for the genes in `genes`, or for all of its
+    genes when None. Other cases' rows and other genes are left as they are,
+    so a load does work in proportion to what it added.
+    """
+    exists = conn.execute(
+        "SELECT count(*) FROM duckdb_tables() "
+        "WHERE table_name = 'gene_variant_summary'"
+    ).fetchone()[0]
+    if not exists:
+        rebuild_gene_summary_table(conn, case_id is not None)
+        return
+
+    cohort = case_id is not None
+    params = {"case_id": case_id} if cohort else {}
+    case_condition = "case_id = $case_id" if cohort else "case_id IS NULL"
+    gene_condition = ""
+    if genes is not None:
+        genes = sorted(set(genes))
+        if not genes:
+            return
+        conn.execute(
+            "CREATE OR REPLACE TEMP TABLE touched_genes AS "
+            "SELECT UNNEST($genes::VARCHAR[]) AS gene_symbol",
+            {"genes": genes},
+        )
+        gene_condition = "AND gene_symbol IN (SELECT gene_symbol FROM touched_genes)"
+    conn.execute(
+        f"DELETE FROM gene_variant_summary WHERE {case_condition} {gene_condition}",
+        params,
+    )
+    conn.execute(
+        f"""
+        INSERT INTO gene_variant_summary
+        {gene_summary_query(cohort, cohort, genes is not None)}
+        """,
+        params,
+    )
+    conn.execute("DROP TABLE IF EXISTS touched_genes")
+
+
+def create_mapping_tables(conn: duckdb.DuckDBPyConnection):
+    """Ensure the mapping tables and their indexes exist."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS variant_genes (
+            vid         VARCHAR,
+            chromosome  VARCHAR,
+            gene_symbol VARCHAR
+        );
 
-        CREATE INDEX vtc_consequence_idx ON variant_consequences(consequence);
-        CREATE INDEX vtc_vid_chr_idx ON variant_consequences(vid, chromosome);
+        CREATE INDEX IF NOT EXISTS vg_gene_idx ON variant_genes(gene_symbol);
+        CREATE INDEX IF NOT EXISTS vg_vid_chr_idx ON variant_genes(vid, chromosome);
+
+        CREATE TABLE IF NOT EXISTS variant_consequences (
+            vid         VARCHAR,
+            chromosome  VARCHAR,
+            consequence VARCHAR
+        );
 
+        CREATE INDEX IF NOT EXISTS vtc_consequence_idx
+            ON variant_consequences(consequence);
+        CREATE INDEX IF NOT EXISTS vtc_vid_chr_idx
+            ON variant_consequences(vid, chromosome);
+
+        CREATE TABLE IF NOT EXISTS clinvar_classifications (
+            vid            VARCHAR,
+            chromosome     VARCHAR,
+            classification VARCHAR
+        );
+
+        CREATE INDEX IF NOT EXISTS vcc_classification_idx
+            ON clinvar_classifications(classification);
+        CREATE INDEX IF NOT EXISTS vcc_vid_chr_idx
+            ON clinvar_classifications(vid, chromosome);
+        """
+    )
+
+
+def rebuild_mapping_tables(conn: duckdb.DuckDBPyConnection):
+    """Rebuild the mapping tables from every row in the variants table."""
+    conn.execute(
+        """
+        DROP TABLE IF EXISTS variant_genes;
+        DROP TABLE IF EXISTS variant_consequences;
         DROP TABLE IF EXISTS clinvar_classifications;
-        CREATE TABLE clinvar_classifications AS
-        SELECT
-        vid,
-        chromosome,
-        UNNEST(clinvar_classifications) AS classification
-        FROM variants
+        """
+    )
+    create_mapping_tables(conn)
+    insert_mappings(conn, "variants")
+
+
+def insert_mappings(conn: duckdb.DuckDBPyConnection, source: str):
+    """
+    Add mapping rows for the variants in `source`, a table or registered view
+    with vid, chromosome, gene_symbols, transcript_consequences and
+    clinvar_classifications columns.
+    """
+    conn.execute(
+        f"""
+        INSERT INTO variant_genes
+        SELECT vid, chromosome, UNNEST(gene_symbols) AS gene_symbol
+        FROM {source}
+        WHERE gene_symbols IS NOT NULL;
+
+        INSERT INTO variant_consequences
+        SELECT vid, chromosome, UNNEST(transcript_consequences) AS consequence
+        FROM {source}
+        WHERE transcript_consequences IS NOT NULL;
+
+        INSERT INTO clinvar_classifications
+        SELECT vid, chromosome, UNNEST(clinvar_classifications) AS classification
+        FROM {source}
         WHERE clinvar_classifications IS NOT NULL;
+        """
+    )
+
 
-        CREATE INDEX vcc_classification_idx ON clinvar_classifications(classification);
-        CREATE INDEX vcc_vid_chr_idx ON clinvar_classifications(vid, chromosome);
+def create_ingest_state_table(conn: duckdb.DuckDBPyConnection):
+    """
+    Ensure the table tracking ingest checkpoints exists. Checkpoints are kept
+    per source file and case ('' outside cohort mode), so loading one file as
+    several cases does not resume one case from another's progress.
+    """
+    has_case_id = conn.execute(
+        "SELECT count(*) FROM duckdb_columns() "
+        "WHERE table_name = '_ingest_state' AND column_name = 'case_id'"
+    ).fetchone()[0]
+    has_table = conn.execute(
+        "SELECT count(*) FROM duckdb_tables() WHERE table_name = '_ingest_state'"
+    ).fetchone()[0]
+    if has_table and not has_case_id:
+        # Tables written before checkpoints were kept per case
+        conn.execute("ALTER TABLE _ingest_state RENAME TO _ingest_state_old")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS _ingest_state (
+            source          VARCHAR NOT NULL,
+            case_id         VARCHAR NOT NULL,
+            positions_done  BIGINT NOT NULL,
+            variants_done   BIGINT NOT NULL,
+            last_chromosome VARCHAR,
+            last_position   INTEGER,
+            completed       BOOLEAN NOT NULL,
+            updated_at      TIMESTAMP NOT NULL,
+            PRIMARY KEY (source, case_id)
+        );
         """
     )
+    if has_table and not has_case_id:
+        conn.execute(
+            """
+            INSERT INTO _ingest_state
+            SELECT source, '', positions_done, variants_done, last_chromosome,
+                   last_position, completed, updated_at
+            FROM _ingest_state_old
+            """
+        )
+        conn.execute("DROP TABLE _ingest_state_old")
 
 
-def batch_insert(
-    conn: duckdb.DuckDBPyConnection, rows: List[tuple], columns: List[str]
+def load_ingest_state(
+    conn: duckdb.DuckDBPyConnection, source: str, case_id: str | None = None
+) -> Dict[str, Any] | None:
+    """Return the last checkpoint recorded for a source file and case, if any."""
+    row = conn.execute(
+        """
+        SELECT positions_done, variants_done, last_chromosome, last_position, completed
+        FROM _ingest_state
+        WHERE source = ? AND case_id = ?
+        """,
+        [source, case_id or ""],
+    ).fetchone()
+    if row is None:
+        return None
+    keys = [
+        "positions_done",
+        "variants_done",
+        "last_chromosome",
+        "last_position",
+        "completed",
+    ]
+    return dict(zip(keys, row))
+
+
+def save_ingest_state(
+    conn: duckdb.DuckDBPyConnection,
+    source: str,
+    state: Dict[str, Any],
+    case_id: str | None = None,
 ):
-    """Insert a batch of rows into the variants table."""
-    placeholders = ", ".join("?" for _ in columns)
-    conn.executemany(
-        f"INSERT INTO variants ({', '.join(columns)}) VALUES ({placeholders})", rows
+    """Record a checkpoint; call inside the transaction that holds its rows."""
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO _ingest_state
+        VALUES (?, ?, ?, ?, ?, ?, ?, current_timestamp)
+        """,
+        [
+            source,
+            case_id or "",
+            state["positions_done"],
+            state["variants_done"],
+            state["last_chromosome"],
+            state["last_position"],
+            state["completed"],
+        ],
+    )
+
+
+class MemoryDeduplicator:
+    """Exact deduplication over every vid seen during the run."""
+
+    ignore_conflicts = False
+
+    def __init__(self):
+        self.seen = set()
+
+    def is_duplicate(self, record: Dict[str, Any]) -> bool:
+        """Return True if the record's vid was already seen."""
+        key = record["vid"]
+        if key in self.seen:
+            return True
+        self.seen.add(key)
+        return False
+
+    def resume(
+        self,
+        conn: duckdb.DuckDBPyConnection,
+        last_chromosome: str | None,
+        case_id: str | None = None,
+    ):
+        """Seed the seen set from rows committed before a checkpoint."""
+        if case_id is None:
+            rows = conn.execute("SELECT vid FROM variants").fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT DISTINCT vid FROM genotypes WHERE case_id = ?", [case_id]
+            ).fetchall()
+        self.seen.update(vid for (vid,) in rows)
+
+
+class ChromosomeDeduplicator:
+    """
+    Deduplication within the current chromosome only.
+
+    Nirvana output is sorted by chromosome, so the seen set can be cleared
+    whenever the chromosome changes. On unsorted input a repeat that slips
+    through violates the (vid, chromosome) primary key and fails the load; use
+    the memory or database strategy for such files.
+    """
+
+    ignore_conflicts = False
+
+    def __init__(self):
+        self.seen = set()
+        self.chromosome = None
+
+    def is_duplicate(self, record: Dict[str, Any]) -> bool:
+        """Return True if the record's vid was already seen on this chromosome."""
+        if record["chromosome"] != self.chromosome:
+            self.chromosome = record["chromosome"]
+            self.seen.clear()
+        key = record["vid"]
+        if key in self.seen:
+            return True
+        self.seen.add(key)
+        return False
+
+    def resume(
+        self,
+        conn: duckdb.DuckDBPyConnection,
+        last_chromosome: str | None,
+        case_id: str | None = None,
+    ):
+        """Seed the seen set from the chromosome that was being loaded."""
+        self.chromosome = last_chromosome
+        if case_id is None:
+            rows = conn.execute(
+                "SELECT vid FROM variants WHERE chromosome = ?", [last_chromosome]
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT DISTINCT vid FROM genotypes "
+                "WHERE case_id = ? AND chromosome = ?",
+                [case_id, last_chromosome],
+            ).fetchall()
+        self.seen.update(vid for (vid,) in rows)
+
+
+class DatabaseDeduplicator:
+    """Leave deduplication to DuckDB with INSERT ... ON CONFLICT DO NOTHING."""
+
+    ignore_conflicts = True
+
+    def is_duplicate(self, record: Dict[str, Any]) -> bool:
+        """Never skip in Python; conflicting rows are dropped on insert."""
+        return False
+
+    def resume(
+        self,
+        conn: duckdb.DuckDBPyConnection,
+        last_chromosome: str | None,
+        case_id: str | None = None,
+    ):
+        """Nothing to restore; the primary key already covers committed rows."""
+
+
+DEDUP_STRATEGIES = {
+    "memory": MemoryDeduplicator,
+    "chromosome": ChromosomeDeduplicator,
+    "database": DatabaseDeduplicator,
+}
+
+
+def rows_to_arrow(
+    rows: List[tuple],
+    columns: List[str],
+    types: Dict[str, pa.DataType] | None = None,
+) -> pa.Table:
+    """Transpose row tuples into a typed Arrow table."""
+    types = types or VARIANT_ARROW_TYPES
+    column_values = list(zip(*rows)) if rows else [[] for _ in columns]
+    return pa.Table.from_arrays(
+        [
+            pa.array(values, type=types[column])
+            for column, values in zip(columns, column_values)
+        ],
+        names=columns,
+    )
+
+
+def batch_insert(
+    conn: duckdb.DuckDBPyConnection,
+    rows: List[tuple],
+    columns: List[str],
+    ignore_conflicts: bool = False,
+    genotype_rows: List[tuple] | None = None,
+) -> int:
+    """
+    Insert a batch of rows into the variants table via an Arrow scan and add
+    mapping rows for the variants that were actually inserted. In cohort mode,
+    `genotype_rows` are appended to the genotypes table.
+    Returns the number of variant rows inserted.
+    """
+    conn.register("variant_batch", rows_to_arrow(rows, columns))
+    try:
+        column_list = ", ".join(c for c in columns if c not in SIDE_COLUMNS)
+        if ignore_conflicts:
+            query = (
+                f"INSERT INTO variants ({column_list}) "
+                f"SELECT DISTINCT ON (vid, chromosome) {column_list} "
+                "FROM variant_batch ON CONFLICT DO NOTHING"
+            )
+        else:
+            query = (
+                f"INSERT INTO variants ({column_list}) "
+                f"SELECT {column_list} FROM variant_batch"
+            )
+        inserted = conn.execute(
+            query + " RETURNING vid, chromosome, gene_symbols, "
+            "transcript_consequences, clinvar_classifications"
+        ).arrow()
+
+        conn.register("inserted_batch", inserted)
+        try:
+            insert_mappings(conn, "inserted_batch")
+            if RAW_BLOB_COLUMN in columns:
+                conn.execute(
+                    f"""
+                    INSERT INTO variant_raw
+                    SELECT DISTINCT ON (vid, chromosome)
+                        vid, chromosome, {RAW_BLOB_COLUMN}
+                    FROM variant_batch
+                    SEMI JOIN inserted_batch USING (vid, chromosome)
+                    """
+                )
+            if set(SUMMARY_COLUMNS) <= set(columns):
+                conn.execute(
+                    f"""
+                    INSERT INTO variant_summaries
+                    SELECT DISTINCT ON (vid, chromosome)
+                        vid, chromosome, {", ".join(SUMMARY_COLUMNS)}
+                    FROM variant_batch
+                    SEMI JOIN inserted_batch USING (vid, chromosome)
+                    """
+                )
+        finally:
+            conn.unregister("inserted_batch")
+    finally:
+        conn.unregister("variant_batch")
+
+    if genotype_rows:
+        conn.register(
+            "genotype_batch",
+            rows_to_arrow(genotype_rows, GENOTYPE_COLUMNS, GENOTYPE_ARROW_TYPES),
+        )
+        try:
+            column_list = ", ".join(GENOTYPE_COLUMNS)
+            if ignore_conflicts:
+                conn.execute(
+                    f"INSERT INTO genotypes ({column_list}) "
+                    "SELECT DISTINCT ON (case_id, sample_id, vid, chromosome) "
+                    f"{column_list} FROM genotype_batch ON CONFLICT DO NOTHING"
+                )
+            else:
+                conn.execute(
+                    f"INSERT INTO genotypes ({column_list}) "
+                    f"SELECT {column_list} FROM genotype_batch"
+                )
+        finally:
+            conn.unregister("genotype_batch")
+    return inserted.num_rows
+
+
+def estimate_record_size(record: Dict[str, Any]) -> int:
+    """Rough in-memory size of a buffered record, in bytes."""
+    list_items = (
+        len(record["gene_symbols"])
+        + len(record["canonical_transcripts"])
+        + len(record["transcript_consequences"])
+        + len(record["clinvar_classifications"])
+    )
+    raw_blob = record.get(RAW_BLOB_COLUMN) or b""
+    summaries = sum(len(record[column]) for column in SUMMARY_COLUMNS)
+    return (
+        2 * len(record["raw"]) + len(raw_blob) + summaries + 64 * list_items + 512
+    )
+
+
+def read_sample_names(
+    json_gz_path: str, parser: str = "auto", threads: int = 1
+) -> List[str]:
+    """Read the sample names listed in the Nirvana JSON header."""
+    _, backend = load_parser_backend(parser)
+    with open_nirvana(json_gz_path, threads) as f:
+        for samples in backend.items(f, "header.samples"):
+            return [str(sample) for sample in samples]
+    return []
+
+
+def parse_sample_roles(mapping: str) -> Dict[str, str]:
+    """
+    Parse a role=sample list such as "proband=NA12878,father=NA12891" into a
+    sample -> role dictionary.
+    """
+    roles = {}
+    for item in mapping.split(","):
+        role, _, sample = item.partition("=")
+        if not role.strip() or not sample.strip():
+            raise ValueError(f"Invalid sample role mapping: {item!r}")
+        roles[sample.strip()] = role.strip()
+    return roles
+
+
+def read_pedigree_roles(ped_path: str, sample_names: Sequence[str]) -> Dict[str, str]:
+    """
+    Derive sample roles from a PED file. The proband is the first affected
+    individual present in the JSON, preferring one whose parents are also
+    present; its father and mother are taken from the same PED row.
+    """
+    individuals = {}
+    with open(ped_path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            fields = line.split()
+            if len(fields) < 6:
+                raise ValueError(f"Invalid PED line: {line.strip()!r}")
+            _, individual, father, mother, _, phenotype = fields[:6]
+            individuals[individual] = (father, mother, phenotype)
+
+    affected = [
+        sample
+        for sample in sample_names
+        if sample in individuals and individuals[sample][2] == "2"
+    ]
+    with_parents = [
+        sample
+        for sample in affected
+        if individuals[sample][0] in sample_names
+        or individuals[sample][1] in sample_names
+    ]
+    if not affected:
+        raise ValueError(f"No affected individual in {ped_path} is in the JSON")
+    proband = (with_parents or affected)[0]
+
+    father, mother, _ = individuals[proband]
+    roles = {proband: "proband"}
+    if father in sample_names:
+        roles[father] = "father"
+    if mother in sample_names:
+        roles[mother] = "mother"
+    return roles
+
+
+def resolve_sample_roles(
+    sample_names: Sequence[str], roles_by_sample: Dict[str, str] | None = None
+) -> List[str]:
+    """
+    Return the role of each sample column, in JSON sample order. Without a
+    mapping the columns are assumed to be proband, father, mother.
+    """
+    if not roles_by_sample:
+        count = len(sample_names) or len(DEFAULT_SAMPLE_ROLES)
+        return [
+            DEFAULT_SAMPLE_ROLES[i] if i < len(DEFAULT_SAMPLE_ROLES)
+            else OTHER_SAMPLE_ROLE
+            for i in range(count)
+        ]
+    missing = [sample for sample in roles_by_sample if sample not in sample_names]
+    if missing:
+        raise ValueError(f"Samples not found in the JSON: {', '.join(missing)}")
+    if "proband" not in roles_by_sample.values():
+        raise ValueError("The sample roles do not include a proband")
+    return [roles_by_sample.get(sample, OTHER_SAMPLE_ROLE) for sample in sample_names]
+
+
+def normalize_genotype(genotype: Any) -> Any:
+    """Unphase a genotype and treat no-calls as reference."""
+    if isinstance(genotype, str):
+        return genotype.replace("|", "/").replace(".", "0")
+    return genotype
+
+
+def sample_fields(sample: Dict[str, Any]) -> Tuple[Any, Any, Any, List[int]]:
+    """Return (genotype, genotype quality, total depth, allele depths)."""
+    genotype_quality = sample.get("genotypeQuality")
+    total_depth = sample.get("totalDepth")
+    allele_depths = sample.get("alleleDepths", [])
+    if not isinstance(allele_depths, list):
+        allele_depths = []
+    return (
+        normalize_genotype(sample.get("genotype")),
+        float(genotype_quality) if genotype_quality is not None else None,
+        int(total_depth) if total_depth is not None else None,
+        [int(x) for x in allele_depths if isinstance(x, (int, float))],
     )
 
 
+def slim_variant(variant: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a Nirvana variant to the fields used by the agent's summaries."""
+    slim = {}
+    if "transcripts" in variant:
+        slim["transcripts"] = [
+            {key: transcript[key] for key in SLIM_TRANSCRIPT_KEYS if key in transcript}
+            for transcript in variant["transcripts"]
+        ]
+    if "clinvar-preview" in variant:
+        entries = []
+        for entry in variant["clinvar-preview"]:
+            slim_entry = {key: entry[key] for key in SLIM_CLINVAR_KEYS if key in entry}
+            germline = entry.get("classifications", {}).get("germlineClassification")
+            if germline is not None:
+                slim_entry["classifications"] = {
+                    "germlineClassification": {
+                        key: germline[key]
+                        for key in SLIM_CLASSIFICATION_KEYS
+                        if key in germline
+                    }
+                }
+            entries.append(slim_entry)
+        slim["clinvar-preview"] = entries
+    return slim
+
+
 def build_variant_record(
-    variant: Dict[str, Any], variant_index: int, position: Dict[str, Any]
+    variant: Dict[str, Any],
+    variant_index: int,
+    position: Dict[str, Any],
+    raw_storage: str = "full",
+    sample_roles: Sequence[str] = tuple(DEFAULT_SAMPLE_ROLES),
+    sample_ids: Sequence[str] = (),
+    case_id: str | None = None,
 ) -> Dict[str, Any]:
     """
     Build a variant record by combining variant and position information.
+
+    `raw_storage` controls the `raw` column: the full variant JSON ("full"),
+    only the fields the agent summarizes ("slim"), or slim JSON plus the full
+    JSON zlib-compressed into `raw_blob` for the variant_raw table ("separate").
+
+    `sample_roles` gives the role of each sample column. With a `case_id`
+    (cohort mode) every sample's call goes to the `genotypes` list and the
+    per-sample columns of the shared variant row are left empty.
     """
     chromosome = position.get("chromosome")
     vid = variant.get("vid")
@@ -131,30 +1226,27 @@ def build_variant_record(
     ref_allele = variant.get("refAllele")
     alt_allele = variant.get("altAllele")
 
-    # Samples:
-    # [0] = proband,
-    # [1] = paternal (if present)
-    # [2] = maternal (if present)
+    # Samples are matched to proband/father/mother through sample_roles
     samples = position.get("samples", [])
-    proband = samples[0] if len(samples) > 0 else {}
-    paternal = samples[1] if len(samples) > 1 else {}
-    maternal = samples[2] if len(samples) > 2 else {}
+    by_role = {}
+    for sample, role in zip(samples, sample_roles):
+        by_role.setdefault(role, sample)
 
-    genotype = proband.get("genotype")
-    if isinstance(genotype, str):
-        genotype = genotype.replace("|", "/").replace(".", "0")
-    genotype_quality = proband.get("genotypeQuality")
-    total_depth = proband.get("totalDepth")
-    allele_depths = proband.get("alleleDepths", [])
-    if not isinstance(allele_depths, list):
-        allele_depths = []
+    genotype, genotype_quality, total_depth, allele_depths = sample_fields(
+        by_role.get("proband", {})
+    )
+    paternal_genotype = normalize_genotype(by_role.get("father", {}).get("genotype"))
+    maternal_genotype = normalize_genotype(by_role.get("mother", {}).get("genotype"))
 
-    paternal_genotype = paternal.get("genotype")
-    maternal_genotype = maternal.get("genotype")
-    if isinstance(paternal_genotype, str):
-        paternal_genotype = paternal_genotype.replace("|", "/").replace(".", "0")
-    if isinstance(maternal_genotype, str):
-        maternal_genotype = maternal_genotype.replace("|", "/").replace(".", "0")
+    genotypes = []
+    if case_id is not None:
+        for i, (sample, role) in enumerate(zip(samples, sample_roles)):
+            sample_id = sample_ids[i] if i < len(sample_ids) else f"sample{i + 1}"
+            genotypes.append(
+                (case_id, sample_id, role, vid, chromosome) + sample_fields(sample)
+            )
+        genotype = genotype_quality = total_depth = allele_depths = None
+        paternal_genotype = maternal_genotype = None
 
     variant_type = variant.get("variantType")
 
@@ -177,8 +1269,7 @@ def build_variant_record(
 
     # gnomAD AF: try multiple common Nirvana/annotation layouts
     gnomad_af = variant.get("gnomad", {}).get("allAf")
-    if gnomad_af is None:
-        gnomad_af = 0.0
+    gnomad_af = float(gnomad_af) if gnomad_af is not None else 0.0
 
     clinvar_classifications = set()
     for clinvar_entry in variant.get("clinvar-preview", []):
@@ -190,8 +1281,17 @@ def build_variant_record(
         if entry_classification:
             clinvar_classifications.add(entry_classification)
 
+    # Display summaries, computed once here instead of on every agent query
+    variant_clinvar_summary = clinvar_summary(variant)
+    variant_transcripts_summary = transcripts_summary(variant)
+
     # Raw variant JSON text
-    raw_json_text = json.dumps(variant, default=decimal_default)
+    raw_json_text = dump_json(variant)
+    raw_blob = None
+    if raw_storage == "separate":
+        raw_blob = zlib.compress(raw_json_text.encode("utf-8"))
+    if raw_storage != "full":
+        raw_json_text = dump_json(slim_variant(variant))
 
     return {
         "chromosome": chromosome,
@@ -204,11 +1304,9 @@ def build_variant_record(
         "ref_allele": ref_allele,
         "alt_allele": alt_allele,
         "genotype": genotype,
-        "genotype_quality": (
-            float(genotype_quality) if genotype_quality is not None else None
-        ),
-        "total_depth": int(total_depth) if total_depth is not None else None,
-        "allele_depths": [int(x) for x in allele_depths if isinstance(x, (int, float))],
+        "genotype_quality": genotype_quality,
+        "total_depth": total_depth,
+        "allele_depths": allele_depths,
         "paternal_genotype": paternal_genotype,
         "maternal_genotype": maternal_genotype,
         "variant_type": variant_type,
@@ -218,9 +1316,78 @@ def build_variant_record(
         "gnomad_af": gnomad_af,
         "clinvar_classifications": list(clinvar_classifications),
         "raw": raw_json_text,
+        RAW_BLOB_COLUMN: raw_blob,
+        "clinvar_summary": variant_clinvar_summary,
+        "transcripts_summary": variant_transcripts_summary,
+        "genotypes": genotypes,
     }
 
 
+def build_position_records(
+    position: Dict[str, Any], **options: Any
+) -> List[Dict[str, Any]]:
+    """
+    Build the variant records for every variant at a position. `options` are
+    passed through to build_variant_record.
+    """
+    return [
+        build_variant_record(variant, variant_index, position, **options)
+        for variant_index, variant in enumerate(position.get("variants", []))
+    ]
+
+
+def build_chunk_records(
+    positions: List[Dict[str, Any]], **options: Any
+) -> List[List[Dict[str, Any]]]:
+    """Build the variant records for a chunk of positions (run in a worker)."""
+    return [build_position_records(position, **options) for position in positions]
+
+
+def chunk_positions(
+    positions: Iterable[Dict[str, Any]], chunk_size: int
+) -> Iterator[List[Dict[str, Any]]]:
+    """Group a position stream into lists of at most `chunk_size` positions."""
+    chunk = []
+    for position in positions:
+        chunk.append(position)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_position_records(
+    positions: Iterable[Dict[str, Any]],
+    workers: int = 1,
+    chunk_size: int = 1000,
+    **options: Any,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield the variant records of each position, in input order.
+
+    With more than one worker, positions are handed out in chunks to a process
+    pool. At most two chunks per worker are in flight so memory stays bounded
+    while the reader keeps every worker busy.
+    """
+    if workers <= 1:
+        for position in positions:
+            yield build_position_records(position, **options)
+        return
+
+    # Workers start from a fresh forkserver process: by now this process runs
+    # DuckDB and BGZF inflate threads, and forking it could deadlock children
+    mp_context = multiprocessing.get_context("forkserver")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+        pending = deque()
+        for chunk in chunk_positions(positions, chunk_size):
+            pending.append(executor.submit(build_chunk_records, chunk, **options))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
 def main():
     """Main function"""
     parser = argparse.ArgumentParser(description=__doc__)
@@ -233,70 +1400,269 @@ def main():
     parser.add_argument(
         "-d",
         "--db",
-        required=True,
-        help="DuckDB database file",
+        default=None,
+        help="DuckDB database file (default: an in-memory database, for use "
+        "with --parquet-dir)",
+    )
+    parser.add_argument(
+        "--parquet-dir",
+        default=None,
+        help="Also write the loaded case as Parquet partitioned by case_id and "
+        "chromosome under this directory",
+    )
+    parser.add_argument(
+        "--case-id",
+        default=None,
+        help="Cohort mode: load this case into a database shared by many cases. "
+        "Variant annotations are stored once and each sample's calls go to the "
+        "genotypes table under this case ID",
+    )
+    roles_group = parser.add_mutually_exclusive_group()
+    roles_group.add_argument(
+        "--sample-roles",
+        default=None,
+        help="Map roles to JSON sample names, e.g. "
+        "proband=NA12878,father=NA12891,mother=NA12892 (default: the first "
+        "three samples are proband, father, mother)",
+    )
+    roles_group.add_argument(
+        "--pedigree",
+        default=None,
+        help="PED file used to assign proband, father and mother roles",
+    )
+    parser.add_argument(
+        "--parser",
+        choices=["auto"] + PARSER_BACKENDS,
+        default="auto",
+        help="ijson backend used to parse the JSON (default: auto, the fastest "
+        "available)",
+    )
+    parser.add_argument(
+        "--decompress-threads",
+        type=int,
+        default=4,
+        help="Threads used to decompress BGZF input; plain gzip is read "
+        "sequentially (default: 4)",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used to build variant records (default: 1)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1000,
+        help="Positions per work unit when using multiple workers (default: 1000)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=5000,
+        help="Rows buffered per insert (default: 5000)",
+    )
+    parser.add_argument(
+        "--batch-memory-mb",
+        type=int,
+        default=None,
+        help="Size insert batches by an approximate memory budget instead of "
+        "--batch-size",
+    )
+    parser.add_argument(
+        "--dedup",
+        choices=sorted(DEDUP_STRATEGIES),
+        default="chromosome",
+        help="How repeated vids are skipped: an exact set over the whole run "
+        "(memory), a set cleared on each chromosome change (chromosome), or the "
+        "table's primary key (database) (default: chromosome)",
+    )
+    parser.add_argument(
+        "--raw-storage",
+        choices=RAW_STORAGE_MODES,
+        default="full",
+        help="What the raw column holds: the full Nirvana JSON (full), only the "
+        "fields used by the variant agent (slim), or slim JSON with the full JSON "
+        "compressed into the variant_raw table (separate) (default: full)",
+    )
+    parser.add_argument(
+        "--rebuild-mappings",
+        action="store_true",
+        help="Rebuild variant_genes, variant_consequences, "
+        "clinvar_classifications and variant_summaries from the whole variants "
+        "table after loading",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=100000,
+        help="Commit and record progress every N positions; 0 commits once at "
+        "the end (default: 100000)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted load of the same JSON file from its last "
+        "checkpoint",
     )
     args = parser.parse_args()
+    if args.db is None and args.parquet_dir is None:
+        parser.error("at least one of --db or --parquet-dir is required")
+    # Parquet partitions need a case name even for single-case databases
+    export_case = args.case_id or os.path.basename(args.json).split(".")[0]
+
+    parser_name, _ = load_parser_backend(args.parser)
+    print(f"Using ijson backend: {parser_name}; raw JSON serializer: orjson")
+    print(
+        "Decompression: "
+        + describe_decompression(args.json, args.decompress_threads)
+    )
+
+    sample_ids = read_sample_names(args.json, parser_name, args.decompress_threads)
+    if args.sample_roles:
+        roles_by_sample = parse_sample_roles(args.sample_roles)
+    elif args.pedigree:
+        roles_by_sample = read_pedigree_roles(args.pedigree, sample_ids)
+    else:
+        roles_by_sample = None
+    sample_roles = resolve_sample_roles(sample_ids, roles_by_sample)
+    print(
+        "Samples: "
+        + ", ".join(
+            f"{sample} ({role})" for sample, role in zip(sample_ids, sample_roles)
+        )
+    )
 
-    conn = duckdb.connect(args.db)
+    conn = duckdb.connect(args.db or ":memory:")
     create_variant_table(conn)
+    create_mapping_tables(conn)
+    create_summary_table(conn)
+    create_ingest_state_table(conn)
+    if args.raw_storage == "separate":
+        create_raw_table(conn)
+    if args.case_id is not None:
+        create_cohort_tables(conn)
+        save_case_samples(conn, args.case_id, sample_ids, sample_roles)
+
+    source = os.path.abspath(args.json)
+    state = load_ingest_state(conn, source, args.case_id)
+    if state is not None and not state["completed"] and not args.resume:
+        raise SystemExit(
+            f"An interrupted load of {args.json} was found in the database; "
+            "rerun with --resume to continue it."
+        )
+    if args.resume and state is not None and state["completed"]:
+        print(f"{args.json} was already loaded completely; nothing to resume.")
+        if args.rebuild_mappings:
+            rebuild_mapping_tables(conn)
+            rebuild_summary_table(conn)
+            rebuild_gene_summary_table(conn, args.case_id is not None)
+        if args.parquet_dir:
+            export_parquet(
+                conn, args.parquet_dir, export_case, args.case_id is not None
+            )
+        conn.close()
+        return
+    if not args.resume or state is None:
+        state = {
+            "positions_done": 0,
+            "variants_done": 0,
+            "last_chromosome": None,
+            "last_position": None,
+            "completed": False,
+        }
 
-    total = 0
+    total = state["variants_done"]
     batch = []
-    batch_size = 5000
-    seen = set()
-
-    cols = [
-        "chromosome",
-        "vid",
-        "variant_index",
-        "position",
-        "quality",
-        "begin_pos",
-        "end_pos",
-        "ref_allele",
-        "alt_allele",
-        "genotype",
-        "genotype_quality",
-        "total_depth",
-        "allele_depths",
-        "paternal_genotype",
-        "maternal_genotype",
-        "variant_type",
-        "gene_symbols",
-        "canonical_transcripts",
-        "transcript_consequences",
-        "gnomad_af",
-        "clinvar_classifications",
-        "raw",
-    ]
+    genotype_batch = []
+    batch_bytes = 0
+    batch_memory = (
+        args.batch_memory_mb * 1024 * 1024 if args.batch_memory_mb else None
+    )
+    dedup = DEDUP_STRATEGIES[args.dedup]()
+    resumed = state["positions_done"] > 0
+    touched_genes = set()
+    if resumed:
+        print(
+            f"Resuming after {state['positions_done']:,} positions "
+            f"({state['last_chromosome']}:{state['last_position']})..."
+        )
+        dedup.resume(conn, state["last_chromosome"], args.case_id)
+    # Cohort databases share one annotation row per variant across cases
+    ignore_conflicts = dedup.ignore_conflicts or args.case_id is not None
+
+    cols = VARIANT_COLUMNS + SUMMARY_COLUMNS
+    if args.raw_storage == "separate":
+        cols = cols + [RAW_BLOB_COLUMN]
+    positions = itertools.islice(
+        stream_positions(args.json, parser_name, args.decompress_threads),
+        state["positions_done"],
+        None,
+    )
 
     conn.execute("BEGIN;")
     try:
-        for position in stream_positions(args.json):
-            for variant_index in range(len(position.get("variants", []))):
-                variant = position["variants"][variant_index]
-
-                key = variant.get("vid")
-                if key in seen:
+        for records in iter_position_records(
+            positions,
+            args.workers,
+            args.chunk_size,
+            raw_storage=args.raw_storage,
+            sample_roles=sample_roles,
+            sample_ids=sample_ids,
+            case_id=args.case_id,
+        ):
+            state["positions_done"] += 1
+            for record in records:
+                state["last_chromosome"] = record["chromosome"]
+                state["last_position"] = record["position"]
+                if dedup.is_duplicate(record):
                     continue
-                seen.add(key)
 
-                record = build_variant_record(variant, variant_index, position)
                 row_tuple = tuple(record[c] for c in cols)
                 batch.append(row_tuple)
+                touched_genes.update(record["gene_symbols"] or ())
+                genotype_batch.extend(record["genotypes"])
+                if batch_memory:
+                    batch_bytes += estimate_record_size(record)
 
-            if len(batch) >= batch_size:
-                batch_insert(conn, batch, cols)
-                total += len(batch)
+            if (batch_memory and batch_bytes >= batch_memory) or (
+                not batch_memory and len(batch) >= args.batch_size
+            ):
+                total += batch_insert(
+                    conn, batch, cols, ignore_conflicts, genotype_batch
+                )
                 print(f"Inserted {total:,} records...")
                 batch.clear()
+                genotype_batch.clear()
+                batch_bytes = 0
+
+            if (
+                args.checkpoint_every
+                and state["positions_done"] % args.checkpoint_every == 0
+            ):
+                if batch:
+                    total += batch_insert(
+                        conn, batch, cols, ignore_conflicts, genotype_batch
+                    )
+                    batch.clear()
+                    genotype_batch.clear()
+                    batch_bytes = 0
+                state["variants_done"] = total
+                save_ingest_state(conn, source, state, args.case_id)
+                conn.execute("COMMIT;")
+                conn.execute("BEGIN;")
 
         if batch:
-            batch_insert(conn, batch, cols)
-            total += len(batch)
+            total += batch_insert(
+                conn, batch, cols, ignore_conflicts, genotype_batch
+            )
             batch.clear()
+            genotype_batch.clear()
 
+        state["variants_done"] = total
+        state["completed"] = True
+        save_ingest_state(conn, source, state, args.case_id)
         conn.execute("COMMIT;")
     except Exception:
         conn.execute("ROLLBACK;")
@@ -304,7 +1670,21 @@ def main():
 
     print(f"Total processed variants: {total:,}")
 
-    create_mapping_tables(conn)
+    if args.rebuild_mappings:
+        print("Rebuilding mapping and summary tables...")
+        rebuild_mapping_tables(conn)
+        rebuild_summary_table(conn)
+        print("Rebuilding per-gene variant summary...")
+        rebuild_gene_summary_table(conn, args.case_id is not None)
+    else:
+        print("Updating per-gene variant summary...")
+        # Genes loaded before a resume are unknown here, so redo the whole case
+        update_gene_summary_table(
+            conn, args.case_id, None if resumed else touched_genes
+        )
+    if args.parquet_dir:
+        print(f"Writing Parquet for case {export_case} to {args.parquet_dir}...")
+        export_parquet(conn, args.parquet_dir, export_case, args.case_id is not None)
     conn.close()
     print("Done.")
 
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# pylint: disable=invalid-name
+
+"""
+Benchmark ijson backends and raw JSON serializers on a gzipped Nirvana JSON file.
+Each backend parses the same positions; throughput is reported in records/sec.
+"""
+
+import argparse
+import gzip
+import itertools
+import json
+import time
+from decimal import Decimal
+from typing import Any, Dict, List
+import ijson
+import orjson
+
+BACKENDS = ["yajl2_c", "yajl2_cffi", "yajl2", "python"]
+
+
+def decimal_default(obj: Any):
+    """JSON serializer for Decimal types."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-j",
+        "--json",
+        required=True,
+        help="Path to gzipped Nirvana JSON (e.g., *.json.gz)",
+    )
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        default=BACKENDS,
+        choices=BACKENDS,
+        help="ijson backends to compare (default: all)",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=100000,
+        help="Number of positions to parse per backend; 0 for the whole file "
+        "(default: 100000)",
+    )
+    return parser.parse_args()
+
+
+def benchmark_backend(json_gz_path: str, backend_name: str, limit: int) -> Dict:
+    """Parse positions with one backend and return counts and timings."""
+    backend = ijson.get_backend(backend_name)
+    positions = 0
+    variants = 0
+    start = time.perf_counter()
+    with gzip.open(json_gz_path, "rb") as f:
+        items = backend.items(f, "positions.item", use_float=True)
+        for position in itertools.islice(items, limit or None):
+            positions += 1
+            variants += len(position.get("variants", []))
+    elapsed = time.perf_counter() - start
+    return {"positions": positions, "variants": variants, "seconds": elapsed}
+
+
+def benchmark_serializers(json_gz_path: str, limit: int) -> Dict[str, float]:
+    """Time json and orjson serialization of the same variants."""
+    sample: List[Dict[str, Any]] = []
+    with gzip.open(json_gz_path, "rb") as f:
+        for position in itertools.islice(
+            ijson.items(f, "positions.item", use_float=True), limit or None
+        ):
+            sample.extend(position.get("variants", []))
+
+    timings = {}
+    start = time.perf_counter()
+    for variant in sample:
+        json.dumps(variant, default=decimal_default)
+    timings["json"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for variant in sample:
+        orjson.dumps(variant, default=decimal_default).decode("utf-8")
+    timings["orjson"] = time.perf_counter() - start
+    timings["records"] = len(sample)
+    return timings
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+
+    print(f"Default ijson backend: {ijson.backend}")
+    print(f"{'backend':<12} {'positions':>12} {'variants':>12} {'records/sec':>14}")
+    for backend_name in args.backends:
+        try:
+            result = benchmark_backend(args.json, backend_name, args.limit)
+        except ImportError:
+            print(f"{backend_name:<12} {'unavailable':>12}")
+            continue
+        rate = result["variants"] / result["seconds"] if result["seconds"] else 0.0
+        print(
+            f"{backend_name:<12} {result['positions']:>12,} "
+            f"{result['variants']:>12,} {rate:>14,.0f}"
+        )
+
+    timings = benchmark_serializers(args.json, args.limit)
+    print(f"\n{'serializer':<12} {'records':>12} {'records/sec':>14}")
+    for name in ["json", "orjson"]:
+        rate = timings["records"] / timings[name] if timings[name] else 0.0
+        print(f"{name:<12} {timings['records']:>12,} {rate:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# pylint: disable=invalid-name
+
+"""
+Benchmark the variant query backends on a variant database. Each backend runs
+the same query_variants calls; latency per tool call is reported as p50/p99.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, List
+from workflow_agents.variant_agent import (
+    BACKENDS,
+    VariantAgentResources,
+    aggregates_over_column,
+    run_variant_query,
+)
+
+BASE_DIR = Path(__file__).parent.resolve()
+
+SEVERE_CONSEQUENCES = [
+    "frameshift_variant",
+    "stop_gained",
+    "splice_acceptor_variant",
+    "splice_donor_variant",
+    "missense_variant",
+]
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--variant-db",
+        type=Path,
+        required=True,
+        help="Path to the variant DuckDB database or Parquet directory",
+    )
+    parser.add_argument(
+        "--case-id",
+        default=None,
+        help="Case to query in a cohort database or Parquet directory",
+    )
+    parser.add_argument(
+        "--genes",
+        nargs="+",
+        required=True,
+        help="Gene symbols to query, one tool call per gene per iteration",
+    )
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        default=BACKENDS,
+        choices=BACKENDS,
+        help="Backends to compare (default: all)",
+    )
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=20,
+        help="Number of passes over the gene list per backend (default: 20)",
+    )
+    parser.add_argument(
+        "--max-gnomad-freq",
+        type=float,
+        default=0.01,
+        help="gnomAD allele frequency filter for each call (default: 0.01)",
+    )
+    parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="Print DuckDB's plan for the benchmark query and check that no "
+        "DISTINCT or GROUP BY runs over the raw JSON column",
+    )
+    return parser.parse_args()
+
+
+async def benchmark_backend(
+    resources: VariantAgentResources, args: argparse.Namespace
+) -> List[float]:
+    """Run the query_variants calls against one backend; return latencies in ms."""
+    latencies = []
+    for _ in range(args.iterations):
+        for gene in args.genes:
+            start = time.perf_counter()
+            # Progress output from the tool would dominate the timings on screen
+            with contextlib.redirect_stdout(io.StringIO()):
+                await run_variant_query(
+                    resources,
+                    gene=gene,
+                    consequence=SEVERE_CONSEQUENCES,
+                    max_gnomad_freq=args.max_gnomad_freq,
+                )
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def explain_query(resources: VariantAgentResources, args: argparse.Namespace) -> bool:
+    """
+    Print the plan of the benchmark query for the first gene and return False
+    if an aggregate operator in it touches the raw column.
+    """
+    _, rows_statement = resources.variant_statements(True, False, True, True)
+    params = {
+        "gene": args.genes[0],
+        "consequence": SEVERE_CONSEQUENCES,
+        "max_gnomad_freq": args.max_gnomad_freq,
+        "limit": 20,
+        "offset": 0,
+    }
+    print(resources.explain(rows_statement, params))
+    plan = json.loads(resources.explain(rows_statement, params, json_format=True))
+    found = [name for node in plan for name in aggregates_over_column(node, "raw")]
+    if found:
+        print(f"Aggregates over the raw column: {', '.join(found)}")
+        return False
+    print("No aggregate runs over the raw column.")
+    return True
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Return p50/p99 latency in ms."""
+    if len(latencies) < 2:
+        return {"p50": latencies[0], "p99": latencies[0]}
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {"p50": percentiles[49], "p99": percentiles[98]}
+
+
+async def main():
+    """Main function"""
+    args = parse_args()
+    variant_db = args.variant_db.expanduser().resolve()
+
+    if args.explain:
+        with contextlib.redirect_stdout(io.StringIO()):
+            resources = VariantAgentResources(
+                database_file=variant_db,
+                prompt_file=BASE_DIR / "prompts/variant_agent.md",
+                case_id=args.case_id,
+                backend="duckdb",
+                cache_size=0,
+            )
+        ok = explain_query(resources, args)
+        resources.close()
+        if not ok:
+            raise SystemExit(1)
+
+    print(f"{'backend':<12} {'calls':>8} {'p50 ms':>10} {'p99 ms':>10}")
+    for backend in args.backends:
+        with contextlib.redirect_stdout(io.StringIO()):
+            resources = VariantAgentResources(
+                database_file=variant_db,
+                prompt_file=BASE_DIR / "prompts/variant_agent.md",
+                case_id=args.case_id,
+                backend=backend,
+                cache_size=0,
+            )
+        latencies = await benchmark_backend(resources, args)
+        resources.close()
+        result = summarize(latencies)
+        print(
+            f"{backend:<12} {len(latencies):>8,} "
+            f"{result['p50']:>10.1f} {result['p99']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,18 +4,19 @@
 """Multi-agent genomics workflow"""
 
 import argparse
+import csv
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Callable, Dict, List
 import asyncio
-from agents import Runner, trace
+import time
+from agents import RunConfig
 from dotenv import load_dotenv
-from workflow_agents.hpo_agent import HPOAgentResources, HPOTermList, create_hpo_agent
-from workflow_agents.gene_agent import (
-    GeneAgentResources,
-    RankedGeneList,
-    create_gene_agent,
-)
-from workflow_agents.variant_agent import VariantAgentResources, create_variant_agent
+from workflow_agents.hpo_agent import HPOAgentResources
+from workflow_agents.llm_cache import CachingModelProvider
+from workflow_agents.gene_agent import GeneAgentResources
+from workflow_agents.variant_agent import BACKENDS, VariantAgentResources
+from workflow_agents.workflow import STAGES, StageCheckpoints, run_workflow
 
 load_dotenv()
 
@@ -26,11 +27,23 @@ BASE_DIR = Path(__file__).parent.resolve()
 class Args:
     """Command-line arguments with types"""
 
-    symptoms: Path
+    symptoms: Path | None
     hpo_db: Path
     phenotypes_to_gene_file: Path
-    variant_db: Path
+    variant_db: Path | None
+    case_id: str | None
+    variant_backend: str
+    query_cache: Path | None
+    query_cache_size: int
     output: Path
+    batch: Path | None
+    concurrency: int
+    batch_summary: Path | None
+    work_dir: Path | None
+    resume: bool
+    from_stage: str | None
+    llm_cache: Path | None
+    replay: bool
 
 
 def parse_args() -> Args:
@@ -39,7 +52,7 @@ def parse_args() -> Args:
     parser.add_argument(
         "--symptoms",
         type=Path,
-        required=True,
+        default=None,
         help="File path to a text description of the patient's symptoms.",
     )
     parser.add_argument(
@@ -57,8 +70,36 @@ def parse_args() -> Args:
     parser.add_argument(
         "--variant-db",
         type=Path,
-        required=True,
-        help="Path to the variant DuckDB database.",
+        default=None,
+        help="Path to the variant DuckDB database, or a Parquet directory written "
+        "by add-variants.py --parquet-dir.",
+    )
+    parser.add_argument(
+        "--case-id",
+        type=str,
+        default=None,
+        help="Case to analyze when the variant database or Parquet directory "
+        "holds a cohort.",
+    )
+    parser.add_argument(
+        "--variant-backend",
+        choices=BACKENDS,
+        default="sqlalchemy",
+        help="How to run variant queries: SQLAlchemy, or native DuckDB cursors "
+        "(default: sqlalchemy).",
+    )
+    parser.add_argument(
+        "--query-cache",
+        type=Path,
+        default=None,
+        help="File to keep variant query results in across runs of the same "
+        "variant database.",
+    )
+    parser.add_argument(
+        "--query-cache-size",
+        type=int,
+        default=1024,
+        help="Number of variant query results to cache; 0 disables the cache.",
     )
     parser.add_argument(
         "--output",
@@ -66,86 +107,286 @@ def parse_args() -> Args:
         default="results.txt",
         help="File path to save the agent's output.",
     )
+    parser.add_argument(
+        "--batch",
+        type=Path,
+        default=None,
+        help="Tab-separated manifest of cases to run in one process, with columns "
+        "symptoms, variant_db and output, and optionally case_id. Replaces "
+        "--symptoms, --variant-db, --case-id and --output.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Number of batch cases to run at the same time (default: 4).",
+    )
+    parser.add_argument(
+        "--batch-summary",
+        type=Path,
+        default=None,
+        help="File for per-case batch timings and failures "
+        "(default: <manifest>.summary.tsv).",
+    )
+    parser.add_argument(
+        "--work-dir",
+        type=Path,
+        default=None,
+        help="Directory for the case's saved stage outputs (default: the output "
+        "path with a .work suffix; batch cases always use that default).",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Reuse saved stage outputs whose inputs have not changed.",
+    )
+    parser.add_argument(
+        "--from-stage",
+        choices=STAGES,
+        default=None,
+        help="Run this stage and the ones after it; reuse saved outputs of "
+        "earlier stages whose inputs have not changed.",
+    )
+    parser.add_argument(
+        "--llm-cache",
+        type=Path,
+        default=None,
+        help="Directory caching model responses; identical model calls in later "
+        "runs are answered from it.",
+    )
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Answer every model call from --llm-cache without network access; "
+        "a call that is not cached fails the run.",
+    )
     args = parser.parse_args()
+    if args.replay and args.llm_cache is None:
+        parser.error("--replay requires --llm-cache")
+    if args.batch is None and (args.symptoms is None or args.variant_db is None):
+        parser.error("--symptoms and --variant-db are required without --batch")
     return Args(**vars(args))
 
 
+def make_run_config(args: Args) -> RunConfig | None:
+    """Return the agents run configuration for the model response cache."""
+    if args.llm_cache is None:
+        return None
+    provider = CachingModelProvider(args.llm_cache.expanduser().resolve(), args.replay)
+    # Replays make no network calls, including trace uploads
+    return RunConfig(model_provider=provider, tracing_disabled=args.replay)
+
+
+async def load_resource(
+    name: str, loader: Callable[..., Any], timings: Dict[str, float], **kwargs
+) -> Any:
+    """Build a resource on a worker thread and record how long it took."""
+    start = time.perf_counter()
+    resource = await asyncio.to_thread(loader, **kwargs)
+    timings[name] = time.perf_counter() - start
+    print(f"{name} resources ready in {timings[name]:.1f} s")
+    return resource
+
+
+def print_load_times(timings: Dict[str, float]):
+    """Print the per-resource load-time breakdown."""
+    if not timings:
+        return
+    print("Resource load times:")
+    for name, seconds in timings.items():
+        print(f"  {name}: {seconds:.1f} s")
+    # The loaders start together, so startup takes as long as the slowest one
+    print(f"  Startup (slowest loader): {max(timings.values()):.1f} s")
+
+
+def read_manifest(manifest: Path) -> List[Dict[str, Any]]:
+    """
+    Read a batch manifest. Relative paths are taken relative to the manifest's
+    directory.
+    """
+    cases = []
+    with open(manifest, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            case = {"case_id": row.get("case_id") or None}
+            for column in ["symptoms", "variant_db", "output"]:
+                if not row.get(column):
+                    raise ValueError(f"{manifest}: missing {column} in row {row}")
+                path = Path(row[column]).expanduser()
+                case[column] = (manifest.parent / path).resolve()
+            cases.append(case)
+    return cases
+
+
+async def run_batch_case(
+    case: Dict[str, Any],
+    args: Args,
+    hpo_task: asyncio.Task,
+    gene_task: asyncio.Task,
+    semaphore: asyncio.Semaphore,
+) -> Dict[str, Any]:
+    """Run one manifest case once a slot is free; return its summary row."""
+    async with semaphore:
+        start = time.perf_counter()
+        summary = {
+            "symptoms": case["symptoms"],
+            "variant_db": case["variant_db"],
+            "case_id": case["case_id"] or "",
+            "output": case["output"],
+        }
+        variant_resources = None
+        try:
+            symptoms_description = case["symptoms"].read_text(encoding="utf-8")
+            # Each case opens its own variant database only when it starts
+            variant_resources = await asyncio.to_thread(
+                VariantAgentResources,
+                database_file=case["variant_db"],
+                prompt_file=BASE_DIR / "prompts/variant_agent.md",
+                case_id=case["case_id"],
+                backend=args.variant_backend,
+                cache_size=args.query_cache_size,
+            )
+            checkpoints = StageCheckpoints(
+                case["output"].with_suffix(".work"), args.resume, args.from_stage
+            )
+            output = await run_workflow(
+                symptoms_description.strip(),
+                hpo_task,
+                gene_task,
+                variant_resources,
+                checkpoints,
+                make_run_config(args),
+            )
+            case["output"].parent.mkdir(parents=True, exist_ok=True)
+            case["output"].write_text(output, encoding="utf-8")
+            summary["status"] = "ok"
+            summary["error"] = ""
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f"Case {case['symptoms']} failed: {e}")
+            summary["status"] = "failed"
+            summary["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            # Release the case's database before the next case opens its own
+            if variant_resources is not None:
+                variant_resources.close()
+        summary["seconds"] = f"{time.perf_counter() - start:.1f}"
+        print(f"Case {case['symptoms']} {summary['status']} in {summary['seconds']} s")
+        return summary
+
+
+async def run_batch(args: Args, hpo_task: asyncio.Task, gene_task: asyncio.Task):
+    """Run every case of a batch manifest on the shared HPO and gene resources."""
+    manifest = args.batch.expanduser().resolve()
+    cases = read_manifest(manifest)
+    summary_file = args.batch_summary or manifest.with_suffix(".summary.tsv")
+    print(f"Running {len(cases)} cases, {args.concurrency} at a time...")
+
+    semaphore = asyncio.Semaphore(max(args.concurrency, 1))
+    start = time.perf_counter()
+    tasks = [
+        asyncio.create_task(run_batch_case(case, args, hpo_task, gene_task, semaphore))
+        for case in cases
+    ]
+    columns = ["symptoms", "variant_db", "case_id", "output", "status", "seconds"]
+    failed = 0
+    # Rows are written as cases finish, so an interrupted batch keeps its results
+    with open(summary_file, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns + ["error"], delimiter="\t")
+        writer.writeheader()
+        for task in asyncio.as_completed(tasks):
+            summary = await task
+            writer.writerow(summary)
+            f.flush()
+            failed += summary["status"] != "ok"
+    print(
+        f"Batch finished in {time.perf_counter() - start:.1f} s: "
+        f"{len(cases) - failed} succeeded, {failed} failed. "
+        f"Summary saved to {summary_file}"
+    )
+
+
 async def main():
     """Main function to run the multi-agent workflow."""
 
     args = parse_args()
-    args.symptoms = args.symptoms.expanduser().resolve()
     args.hpo_db = args.hpo_db.expanduser().resolve()
     args.phenotypes_to_gene_file = args.phenotypes_to_gene_file.expanduser().resolve()
-    args.variant_db = args.variant_db.expanduser().resolve()
-    args.output = args.output.expanduser().resolve()
+    if args.query_cache is not None:
+        args.query_cache = args.query_cache.expanduser().resolve()
 
-    for required_file in [args.symptoms, args.hpo_db, args.phenotypes_to_gene_file]:
+    required_files = [args.hpo_db, args.phenotypes_to_gene_file]
+    if args.batch is None:
+        args.symptoms = args.symptoms.expanduser().resolve()
+        args.variant_db = args.variant_db.expanduser().resolve()
+        args.output = args.output.expanduser().resolve()
+        required_files.append(args.symptoms)
+    for required_file in required_files:
         if not required_file.is_file():
             print(f"File not found: {required_file}")
             return
 
-    symptoms_description = args.symptoms.read_text(encoding="utf-8").strip()
-
-    hpo_resources = HPOAgentResources(
-        index_json=args.hpo_db, prompt_file=BASE_DIR / "prompts/hpo_agent.md"
+    # Load all resources concurrently; each stage waits only for its own
+    timings: Dict[str, float] = {}
+    hpo_task = asyncio.create_task(
+        load_resource(
+            "HPO",
+            HPOAgentResources,
+            timings,
+            index_json=args.hpo_db,
+            prompt_file=BASE_DIR / "prompts/hpo_agent.md",
+        )
     )
-    hpo_agent = create_hpo_agent(hpo_resources)
-
-    gene_resources = GeneAgentResources(
-        phenotypes_to_gene_file=args.phenotypes_to_gene_file,
-        prompt_file=BASE_DIR / "prompts/gene_agent.md",
+    gene_task = asyncio.create_task(
+        load_resource(
+            "Gene",
+            GeneAgentResources,
+            timings,
+            phenotypes_to_gene_file=args.phenotypes_to_gene_file,
+            prompt_file=BASE_DIR / "prompts/gene_agent.md",
+        )
     )
-    gene_agent = create_gene_agent(gene_resources)
+    if args.batch is not None:
+        await run_batch(args, hpo_task, gene_task)
+        # No case may have needed a loader, e.g. when all failed before starting
+        for task in [hpo_task, gene_task]:
+            task.cancel()
+        print_load_times(timings)
+        return
 
-    variant_resources = VariantAgentResources(
-        database_file=args.variant_db,
-        prompt_file=BASE_DIR / "prompts/variant_agent.md",
+    symptoms_description = args.symptoms.read_text(encoding="utf-8").strip()
+    variant_task = asyncio.create_task(
+        load_resource(
+            "Variant",
+            VariantAgentResources,
+            timings,
+            database_file=args.variant_db,
+            prompt_file=BASE_DIR / "prompts/variant_agent.md",
+            case_id=args.case_id,
+            backend=args.variant_backend,
+            cache_size=args.query_cache_size,
+            cache_file=args.query_cache,
+        )
     )
-    variant_agent = create_variant_agent(variant_resources)
 
-    with trace("genomics-workflow"):
-        print("Starting HPO search...")
-        hpo_result = await Runner.run(
-            starting_agent=hpo_agent,
-            context=hpo_resources,
-            input=symptoms_description,
-            max_turns=20,
-        )
-        hpo_terms = hpo_result.final_output_as(HPOTermList)
-        print("HPO search completed. Found terms:")
-        terms_input = ""
-        for term in hpo_terms.terms:
-            terms_input += f"{term.id}: {term.text} (Reasoning: {term.reasoning})\n"
-        print(terms_input)
-
-        print("Starting gene search...")
-        gene_result = await Runner.run(
-            starting_agent=gene_agent, context=gene_resources, input=terms_input
-        )
-        ranked_genes = gene_result.final_output_as(RankedGeneList)
-        print("Gene search completed. Ranked genes:")
-        genes_input = ""
-        for gene in ranked_genes.genes:
-            genes_input += (
-                f"Gene: {gene.gene}, "
-                f"Rank: {gene.rank}, "
-                f"Reasoning: {gene.reasoning}\n"
-            )
-        print(genes_input)
-
-        print("Starting variant search...")
-        variant_result = await Runner.run(
-            starting_agent=variant_agent,
-            context=variant_resources,
-            input=symptoms_description + "\n\nCandidate genes:\n" + genes_input,
-            max_turns=20,
-        )
-        print("Variant search completed. Results:")
-        print(variant_result.final_output)
-        with open(args.output, "w", encoding="utf-8") as out_file:
-            out_file.write(variant_result.final_output)
+    work_dir = args.work_dir or args.output.with_suffix(".work")
+    checkpoints = StageCheckpoints(
+        work_dir.expanduser().resolve(), args.resume, args.from_stage
+    )
+    output = await run_workflow(
+        symptoms_description,
+        hpo_task,
+        gene_task,
+        variant_task,
+        checkpoints,
+        make_run_config(args),
+    )
+    with open(args.output, "w", encoding="utf-8") as out_file:
+        out_file.write(output)
     print(f"Results saved to {args.output}")
+    print_load_times(timings)
+    variant_resources = await variant_task
+    hits, misses = variant_resources.cache.stats()
+    print(f"Variant query cache: {hits} hits, {misses} misses")
+    variant_resources.cache.save()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+#! /usr/bin/env python
+# pylint: disable=invalid-name
+
+"""Submit a case to a running workflow-server.py and save the agent's output."""
+
+import argparse
+import json
+import socket
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.resolve()
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--symptoms",
+        type=Path,
+        required=True,
+        help="File path to a text description of the patient's symptoms.",
+    )
+    parser.add_argument(
+        "--variant-db",
+        type=Path,
+        required=True,
+        help="Path to the variant DuckDB database, or a Parquet directory written "
+        "by add-variants.py --parquet-dir.",
+    )
+    parser.add_argument(
+        "--case-id",
+        type=str,
+        default=None,
+        help="Case to analyze when the variant database or Parquet directory "
+        "holds a cohort.",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default="results.txt",
+        help="File path to save the agent's output.",
+    )
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        default=BASE_DIR / "workflow.sock",
+        help="Unix socket of the workflow server.",
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Send the case to the server and wait for its report."""
+    args = parse_args()
+    symptoms = args.symptoms.expanduser().resolve()
+    if not symptoms.is_file():
+        print(f"File not found: {symptoms}")
+        return
+    request = {
+        "symptoms": symptoms.read_text(encoding="utf-8").strip(),
+        "variant_db": str(args.variant_db.expanduser().resolve()),
+        "case_id": args.case_id,
+    }
+
+    print(f"Submitting case to {args.socket}...")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(str(args.socket.expanduser()))
+        conn.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with conn.makefile("rb") as reply:
+            response = json.loads(reply.readline())
+
+    if "error" in response:
+        raise SystemExit(f"Workflow failed: {response['error']}")
+    print(response["output"])
+    output = args.output.expanduser().resolve()
+    output.write_text(response["output"], encoding="utf-8")
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Shared fixtures: a tiny trio annotated by Nirvana, loaded with add-variants.py"""
+
+import gzip
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+
+REPO_DIR = Path(__file__).parent.parent.resolve()
+DATA_DIR = Path(__file__).parent / "data"
+# The scripts import workflow_agents from the repository directory
+sys.path.insert(0, str(REPO_DIR))
+
+
+def add_variants(*args: str):
+    """Run add-variants.py and fail the test with its output if it fails."""
+    result = subprocess.run(
+        [sys.executable, str(REPO_DIR / "add-variants.py"), *args],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+@pytest.fixture(scope="session")
+def nirvana_json(tmp_path_factory) -> Path:
+    """The trio fixture, gzipped the way Nirvana writes it."""
+    path = tmp_path_factory.mktemp("nirvana") / "trio.json.gz"
+    with open(DATA_DIR / "nirvana_trio.json", "rb") as src:
+        with gzip.open(path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+    return path
+
+
+@pytest.fixture(scope="session")
+def variant_db(tmp_path_factory, nirvana_json: Path) -> Path:
+    """A single-case variant database of the trio fixture."""
+    path = tmp_path_factory.mktemp("db") / "trio.duckdb"
+    add_variants("-j", str(nirvana_json), "-d", str(path))
+    return path
+
+
+@pytest.fixture(scope="session")
+def cohort_db(tmp_path_factory, nirvana_json: Path) -> Path:
+    """A cohort database holding the trio fixture as case1 and case2."""
+    path = tmp_path_factory.mktemp("db") / "cohort.duckdb"
+    for case_id in ["case1", "case2"]:
+        add_variants("-j", str(nirvana_json), "-d", str(path), "--case-id", case_id)
+    return path
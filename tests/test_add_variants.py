@@ -0,0 +1,166 @@
+"""Smoke tests for loading Nirvana JSON with add-variants.py"""
+
+import copy
+import gzip
+import json
+from pathlib import Path
+from typing import List
+import duckdb
+from conftest import DATA_DIR, add_variants
+
+MAPPING_TABLES = [
+    "variant_genes",
+    "variant_consequences",
+    "clinvar_classifications",
+    "variant_summaries",
+]
+
+
+def fetch(path: Path, sql: str) -> List[tuple]:
+    """Run a query on a variant database and return its rows."""
+    with duckdb.connect(str(path), read_only=True) as conn:
+        return conn.execute(sql).fetchall()
+
+
+def count(path: Path, table: str) -> int:
+    """Number of rows in a table of a variant database."""
+    return fetch(path, f"SELECT count(*) FROM {table}")[0][0]
+
+
+def test_single_case_ingest(variant_db: Path):
+    assert count(variant_db, "variants") == 7
+    assert {table: count(variant_db, table) for table in MAPPING_TABLES} == {
+        "variant_genes": 7,
+        "variant_consequences": 7,
+        "clinvar_classifications": 4,
+        "variant_summaries": 7,
+    }
+    rows = fetch(
+        variant_db,
+        """
+        SELECT genotype, paternal_genotype, maternal_genotype, gnomad_af
+        FROM variants WHERE vid = 'chr1-100-A-T'
+        """,
+    )
+    assert rows == [("0/1", "0/0", "0/1", 0.0001)]
+
+
+def test_worker_processes_match_single_process(
+    tmp_path: Path, nirvana_json: Path, variant_db: Path
+):
+    path = tmp_path / "workers.duckdb"
+    add_variants("-j", str(nirvana_json), "-d", str(path), "-w", "2")
+    sql = "SELECT * EXCLUDE (raw) FROM variants ORDER BY chromosome, begin_pos"
+    assert fetch(path, sql) == fetch(variant_db, sql)
+
+
+def test_cohort_ingest(cohort_db: Path):
+    # Annotations are shared; calls are stored per case and sample
+    assert count(cohort_db, "variants") == 7
+    assert fetch(
+        cohort_db,
+        """
+        SELECT case_id, count(*) FROM genotypes
+        WHERE sample_role = 'proband' GROUP BY case_id ORDER BY case_id
+        """,
+    ) == [("case1", 7), ("case2", 7)]
+
+
+def test_resume_state_is_kept_per_case(tmp_path: Path, nirvana_json: Path):
+    path = tmp_path / "cohort.duckdb"
+    add_variants("-j", str(nirvana_json), "-d", str(path), "--case-id", "case1")
+    # case1's completed load of the same file is not case2's checkpoint
+    add_variants(
+        "-j", str(nirvana_json), "-d", str(path), "--case-id", "case2", "--resume"
+    )
+    assert fetch(
+        path, "SELECT case_id, count(*) FROM genotypes GROUP BY ALL ORDER BY ALL"
+    ) == [("case1", 21), ("case2", 21)]
+    assert fetch(path, "SELECT case_id FROM _ingest_state ORDER BY ALL") == [
+        ("case1",),
+        ("case2",),
+    ]
+
+
+def test_parquet_export(tmp_path: Path, nirvana_json: Path):
+    parquet_dir = tmp_path / "parquet"
+    add_variants("-j", str(nirvana_json), "--parquet-dir", str(parquet_dir))
+    with duckdb.connect() as conn:
+        for table, rows in [("variants", 7), ("variant_genes", 7)]:
+            files = str(parquet_dir / table / "**" / "*.parquet")
+            total = conn.execute(
+                f"SELECT count(*) FROM read_parquet('{files}', hive_partitioning = 1)"
+            ).fetchone()[0]
+            assert total == rows
+
+
+def test_summaries_backfilled_for_existing_variants(tmp_path: Path, nirvana_json: Path):
+    path = tmp_path / "old.duckdb"
+    add_variants("-j", str(nirvana_json), "-d", str(path))
+    # A database loaded before variant summaries were precomputed
+    with duckdb.connect(str(path)) as conn:
+        conn.execute("DROP TABLE variant_summaries")
+
+    add_variants("-j", str(nirvana_json), "-d", str(path), "--dedup", "database")
+    assert count(path, "variant_summaries") == 7
+    rows = fetch(
+        path,
+        "SELECT clinvar_summary FROM variant_summaries WHERE vid = 'chr1-100-A-T'",
+    )
+    assert "Pathogenic" in rows[0][0]
+
+
+def gene_summary(path: Path) -> List[tuple]:
+    """The gene rollup of a variant database, in a stable order."""
+    return fetch(path, "SELECT * FROM gene_variant_summary ORDER BY ALL")
+
+
+def test_gene_summary_matches_full_rebuild(tmp_path: Path, nirvana_json: Path):
+    path = tmp_path / "cohort.duckdb"
+    for case_id in ["case1", "case2"]:
+        add_variants("-j", str(nirvana_json), "-d", str(path), "--case-id", case_id)
+    incremental = gene_summary(path)
+    assert {row[0] for row in incremental} == {"case1", "case2"}
+
+    add_variants(
+        "-j",
+        str(nirvana_json),
+        "-d",
+        str(path),
+        "--case-id",
+        "case2",
+        "--resume",
+        "--rebuild-mappings",
+    )
+    assert gene_summary(path) == incremental
+
+
+def test_gene_summary_after_append(tmp_path: Path):
+    # A second file with one more variant in G1 and one in a new gene
+    doc = json.loads((DATA_DIR / "nirvana_trio.json").read_text(encoding="utf-8"))
+    extra = []
+    for position_number, gene in [(400, "G1"), (500, "G9")]:
+        position = copy.deepcopy(doc["positions"][1])
+        variant = position["variants"][0]
+        position["position"] = variant["begin"] = variant["end"] = position_number
+        variant["vid"] = f"chr1-{position_number}-A-T"
+        variant["transcripts"][0]["hgnc"] = gene
+        extra.append(position)
+    extra_json = tmp_path / "extra.json.gz"
+    with gzip.open(extra_json, "wt", encoding="utf-8") as f:
+        json.dump({**doc, "positions": extra}, f)
+    first_json = tmp_path / "trio.json.gz"
+    with gzip.open(first_json, "wt", encoding="utf-8") as f:
+        json.dump(doc, f)
+
+    path = tmp_path / "append.duckdb"
+    add_variants("-j", str(first_json), "-d", str(path))
+    add_variants("-j", str(extra_json), "-d", str(path))
+    incremental = gene_summary(path)
+    assert sum(row[-1] for row in incremental if row[1] == "G1") == 4
+    assert sum(row[-1] for row in incremental if row[1] == "G9") == 1
+
+    add_variants(
+        "-j", str(extra_json), "-d", str(path), "--resume", "--rebuild-mappings"
+    )
+    assert gene_summary(path) == incremental
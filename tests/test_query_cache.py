@@ -0,0 +1,21 @@
+"""Tests for the variant query cache"""
+
+from pathlib import Path
+from conftest import add_variants
+from workflow_agents.query_cache import database_fingerprint
+
+
+def test_parquet_fingerprint_covers_only_the_case(tmp_path: Path, nirvana_json: Path):
+    parquet_dir = tmp_path / "archive"
+    add_variants(
+        "-j", str(nirvana_json), "--parquet-dir", str(parquet_dir), "--case-id", "a"
+    )
+    before = database_fingerprint(parquet_dir, "a")
+    assert "case_id=a" in before
+
+    # Adding another case leaves case a's cached results valid
+    add_variants(
+        "-j", str(nirvana_json), "--parquet-dir", str(parquet_dir), "--case-id", "b"
+    )
+    assert database_fingerprint(parquet_dir, "a") == before
+    assert "case_id=a" not in database_fingerprint(parquet_dir, "b")
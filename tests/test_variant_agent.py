@@ -0,0 +1,223 @@
+"""Tests for the variant agent's resources and queries"""
+
+import asyncio
+import itertools
+import json
+import re
+import shutil
+from pathlib import Path
+import duckdb
+import pytest
+from conftest import REPO_DIR, add_variants
+from workflow_agents.variant_agent import (
+    BACKENDS,
+    CURSOR_COLUMNS,
+    INHERITANCE_MODES,
+    VariantAgentResources,
+    aggregates_over_column,
+    decode_cursor,
+    encode_cursor,
+    run_variant_batch_query,
+    run_variant_query,
+    scanned_columns,
+)
+
+PROMPT_FILE = REPO_DIR / "prompts/variant_agent.md"
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_cohort_database_requires_case_id(cohort_db: Path, backend: str):
+    with pytest.raises(ValueError, match="case_id is required"):
+        VariantAgentResources(cohort_db, PROMPT_FILE, backend=backend)
+    resources = VariantAgentResources(
+        cohort_db, PROMPT_FILE, case_id="case1", backend=backend
+    )
+    try:
+        assert resources.query({"limit": 20, "offset": 0}).total_variants == 7
+    finally:
+        resources.close()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_parquet_archive_requires_case_id(
+    tmp_path: Path, nirvana_json: Path, backend: str
+):
+    parquet_dir = tmp_path / "archive"
+    add_variants("-j", str(nirvana_json), "--parquet-dir", str(parquet_dir))
+    resources = VariantAgentResources(parquet_dir, PROMPT_FILE, backend=backend)
+    resources.close()
+
+    add_variants(
+        "-j", str(nirvana_json), "--parquet-dir", str(parquet_dir), "--case-id", "b"
+    )
+    with pytest.raises(ValueError, match="case_id is required"):
+        VariantAgentResources(parquet_dir, PROMPT_FILE, backend=backend)
+    resources = VariantAgentResources(
+        parquet_dir, PROMPT_FILE, case_id="b", backend=backend
+    )
+    try:
+        assert resources.query({"limit": 20, "offset": 0}).total_variants == 7
+    finally:
+        resources.close()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_cursor_pages(variant_db: Path, backend: str):
+    resources = VariantAgentResources(variant_db, PROMPT_FILE, backend=backend)
+    try:
+        filters = {"gene": "G1", "limit": 1, "offset": 0}
+        positions = []
+        cursor_filters = dict(filters)
+        while True:
+            results = resources.query(cursor_filters)
+            assert results.total_variants == 3
+            if not results.variants:
+                break
+            last = results.variants[-1]
+            positions.append(last["position"])
+            cursor = encode_cursor([last[name] for name in CURSOR_COLUMNS])
+            cursor_filters = {**filters, **decode_cursor(cursor)}
+        assert positions == [100, 200, 300]
+
+        # Cursor pages read on from the cursor without counting every match
+        _, rows_statement = resources.variant_statements(
+            True, False, False, False, has_cursor=True
+        )
+        if backend == "duckdb":
+            assert "WINDOW" not in resources.explain(rows_statement, cursor_filters)
+    finally:
+        resources.close()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_empty_page_total_is_counted(variant_db: Path, backend: str):
+    resources = VariantAgentResources(
+        variant_db, PROMPT_FILE, backend=backend, cache_size=0
+    )
+    try:
+        # A zero-row page has no window count to read the total from
+        results = resources.query({"gene": "G1", "limit": 0, "offset": 0})
+        assert (results.variants, results.total_variants) == ([], 3)
+        results = resources.query({"gene": "G1", "limit": 1, "offset": 1})
+        assert results.total_variants == 3
+
+        text = asyncio.run(run_variant_query(resources, gene="G1", limit=0))
+        assert "Total variants found: 3" in text
+        assert "Displaying 1 variants" in text and "Next cursor:" in text
+    finally:
+        resources.close()
+
+
+INHERITANCE_VARIANTS = {
+    "de_novo": ["chr2-100-A-T"],
+    "compound_het": ["chr1-100-A-T", "chr1-200-A-T"],
+    "homozygous_recessive": ["chr1-300-A-T", "chr3-100-A-T"],
+    "x_linked": ["chrX-100-A-T"],
+}
+
+
+@pytest.mark.parametrize("database", ["variant_db", "cohort_db"])
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_inheritance_filters(request, database: str, backend: str):
+    case_id = "case1" if database == "cohort_db" else None
+    resources = VariantAgentResources(
+        request.getfixturevalue(database), PROMPT_FILE, case_id=case_id, backend=backend
+    )
+    try:
+        for inheritance, vids in INHERITANCE_VARIANTS.items():
+            results = resources.query({"limit": 20, "offset": 0}, inheritance)
+            assert [row["vid"] for row in results.variants] == vids, inheritance
+            assert results.total_variants == len(vids), inheritance
+    finally:
+        resources.close()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_batch_query_continues_with_cursor(variant_db: Path, backend: str):
+    resources = VariantAgentResources(
+        variant_db, PROMPT_FILE, backend=backend, cache_size=0
+    )
+    try:
+        text = asyncio.run(
+            run_variant_batch_query(resources, ["G1", "G2"], limit_per_gene=1)
+        )
+        assert text.count("Total variants found: 3") == 1
+        cursor = re.search(r"cursor=(\S+) ", text).group(1)
+        rest = resources.query(
+            {"gene": "G1", "limit": 20, "offset": 0, **decode_cursor(cursor)}
+        )
+        assert [row["position"] for row in rest.variants] == [200, 300]
+
+        # A zero limit still reports each gene's total
+        text = asyncio.run(
+            run_variant_batch_query(resources, ["G1", "G2"], limit_per_gene=0)
+        )
+        assert "Total variants found: 3" in text
+        assert "Total variants found: 1" in text
+    finally:
+        resources.close()
+
+
+PLAN_PARAMS = {
+    "gene": "G1",
+    "clinvar": ["Pathogenic"],
+    "consequence": ["missense_variant"],
+    "max_gnomad_freq": 0.01,
+    "after_chromosome": "chr1",
+    "after_begin_pos": 100,
+    "after_variant_index": 0,
+    "after_vid": "chr1-100-A-T",
+    "limit": 20,
+    "offset": 0,
+}
+
+
+@pytest.fixture(name="plan_db", params=["summaries", "no_summaries"])
+def fixture_plan_db(request, tmp_path: Path, variant_db: Path) -> Path:
+    """The trio database, with and without precomputed variant summaries."""
+    path = tmp_path / "plan.duckdb"
+    shutil.copy(variant_db, path)
+    if request.param == "no_summaries":
+        with duckdb.connect(str(path)) as conn:
+            conn.execute("DROP TABLE variant_summaries")
+    return path
+
+
+def test_no_aggregate_over_raw(plan_db: Path):
+    resources = VariantAgentResources(plan_db, PROMPT_FILE, backend="duckdb")
+    try:
+        for flags in itertools.product([False, True], repeat=5):
+            for inheritance in [None, *INHERITANCE_MODES]:
+                for statement in resources.variant_statements(*flags, inheritance):
+                    text = resources.explain(statement, PLAN_PARAMS, json_format=True)
+                    for node in json.loads(text):
+                        found = aggregates_over_column(node, "raw")
+                        assert not found, (flags, inheritance)
+
+        # Only the fallback without summaries reads raw at all
+        _, rows_statement = resources.variant_statements(True, False, True, True)
+        plan = json.loads(
+            resources.explain(rows_statement, PLAN_PARAMS, json_format=True)
+        )
+        reads_raw = any("raw" in scanned_columns(node) for node in plan)
+        assert reads_raw == (resources.variant_summaries is None)
+    finally:
+        resources.close()
+
+
+def test_aggregate_over_raw_is_detected(variant_db: Path):
+    with duckdb.connect(str(variant_db), read_only=True) as conn:
+        rows = conn.execute(
+            "EXPLAIN (FORMAT JSON) SELECT DISTINCT vid, raw FROM variants"
+        ).fetchall()
+    plan = json.loads(rows[0][1])
+    assert [n for node in plan for n in aggregates_over_column(node, "raw")]
+
+    # Columns are matched by name, not by substring
+    scan = {
+        "name": "SEQ_SCAN ",
+        "extra_info": {"Table": "variants", "Projections": ["vid", "raw_blob"]},
+    }
+    assert not aggregates_over_column(
+        {"name": "HASH_GROUP_BY", "children": [scan]}, "raw"
+    )
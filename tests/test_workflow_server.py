@@ -0,0 +1,48 @@
+"""Tests for the workflow server's handling of variant databases"""
+
+import asyncio
+import importlib.util
+from pathlib import Path
+import duckdb
+import pytest
+from conftest import REPO_DIR
+
+# The server loads the HPO agent, which needs the embedding model packages
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("hnswlib")
+
+
+def load_server_module():
+    """Import workflow-server.py, whose name is not a valid module name."""
+    spec = importlib.util.spec_from_file_location(
+        "workflow_server", REPO_DIR / "workflow-server.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_concurrent_cases_on_a_bad_database(tmp_path: Path, monkeypatch):
+    workflow_server = load_server_module()
+
+    async def run_workflow(symptoms, hpo, gene, variant_resources):
+        await asyncio.sleep(0.1)
+        return await variant_resources
+
+    monkeypatch.setattr(workflow_server, "run_workflow", run_workflow)
+    bad_db = tmp_path / "bad.duckdb"
+    bad_db.write_text("not a database", encoding="utf-8")
+    server = workflow_server.WorkflowServer(None, None, 0, "duckdb", 2)
+    request = {"symptoms": "", "variant_db": str(bad_db)}
+
+    async def run_cases():
+        return await asyncio.gather(
+            server.run_case(request), server.run_case(request), return_exceptions=True
+        )
+
+    results = asyncio.run(run_cases())
+    # Both cases see the open error, not a failure of the other's release
+    assert all(isinstance(result, duckdb.Error) for result in results), results
+    # The failed attempt is forgotten, so a later case opens the database again
+    assert not server.variant_resources
+    assert not server.variant_users
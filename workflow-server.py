@@ -0,0 +1,226 @@
+#! /usr/bin/env python
+# pylint: disable=invalid-name
+
+"""
+Long-running workflow server. Loads the HPO and gene resources once, then runs
+cases submitted over a Unix socket concurrently on the shared resources. Use
+submit-case.py to submit a case.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Tuple
+from dotenv import load_dotenv
+from workflow_agents.hpo_agent import HPOAgentResources
+from workflow_agents.gene_agent import GeneAgentResources
+from workflow_agents.variant_agent import BACKENDS, VariantAgentResources
+from workflow_agents.workflow import run_workflow
+
+load_dotenv()
+
+BASE_DIR = Path(__file__).parent.resolve()
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        default=BASE_DIR / "workflow.sock",
+        help="Path of the Unix socket to listen on.",
+    )
+    parser.add_argument(
+        "--hpo-db",
+        type=Path,
+        default=BASE_DIR / "resources/hpo_agent/SapBERT-PubMedBERT_hpo.json.gz",
+        help="Path to the HPO database JSON file.",
+    )
+    parser.add_argument(
+        "--phenotypes-to-gene-file",
+        type=Path,
+        default=BASE_DIR / "resources/gene_agent/phenotype_to_genes.txt",
+        help="Path to the phenotype to gene mapping file.",
+    )
+    parser.add_argument(
+        "--query-cache-size",
+        type=int,
+        default=1024,
+        help="Number of variant query results to cache per variant database; "
+        "0 disables the cache.",
+    )
+    parser.add_argument(
+        "--variant-backend",
+        choices=BACKENDS,
+        default="sqlalchemy",
+        help="How to run variant queries for all cases: SQLAlchemy, or native "
+        "DuckDB cursors (default: sqlalchemy).",
+    )
+    parser.add_argument(
+        "--max-open-databases",
+        type=int,
+        default=16,
+        help="Number of variant databases to keep open between cases; the least "
+        "recently used idle database is closed first (default: 16).",
+    )
+    return parser.parse_args()
+
+
+class WorkflowServer:
+    """Shared resources and the handler for submitted cases."""
+
+    def __init__(
+        self,
+        hpo_resources: HPOAgentResources,
+        gene_resources: GeneAgentResources,
+        query_cache_size: int,
+        variant_backend: str,
+        max_open_databases: int,
+    ):
+        self.hpo_resources = hpo_resources
+        self.gene_resources = gene_resources
+        self.query_cache_size = query_cache_size
+        # DuckDB opens each file with one configuration per process, so every
+        # case uses the same backend
+        self.variant_backend = variant_backend
+        self.max_open_databases = max_open_databases
+        # Variant resources are opened on first use and kept for later cases,
+        # least recently used first
+        self.variant_resources: OrderedDict[Tuple[str, str | None], asyncio.Task] = (
+            OrderedDict()
+        )
+        self.variant_users: Dict[Tuple[str, str | None], int] = {}
+
+    def acquire_variant_resources(
+        self, variant_db: Path, case_id: str | None
+    ) -> asyncio.Task:
+        """Return the (possibly still loading) resources for a variant database."""
+        key = (str(variant_db), case_id)
+        if key not in self.variant_resources:
+            self.variant_resources[key] = asyncio.create_task(
+                asyncio.to_thread(
+                    VariantAgentResources,
+                    database_file=variant_db,
+                    prompt_file=BASE_DIR / "prompts/variant_agent.md",
+                    case_id=case_id,
+                    backend=self.variant_backend,
+                    cache_size=self.query_cache_size,
+                )
+            )
+        self.variant_resources.move_to_end(key)
+        self.variant_users[key] = self.variant_users.get(key, 0) + 1
+        return self.variant_resources[key]
+
+    def release_variant_resources(self, variant_db: Path, case_id: str | None):
+        """Mark a case as done with a database and close idle ones over the limit."""
+        key = (str(variant_db), case_id)
+        self.variant_users[key] -= 1
+        task = self.variant_resources.get(key)
+        failed = task is not None and task.done() and task.exception() is not None
+        if failed and not self.variant_users[key]:
+            # Let a later case retry a database that failed to open, once no
+            # running case is still waiting on the failed attempt
+            del self.variant_resources[key]
+            del self.variant_users[key]
+        idle = [
+            k
+            for k, t in self.variant_resources.items()
+            if t.done() and not self.variant_users[k]
+        ]
+        while idle and len(self.variant_resources) > self.max_open_databases:
+            self.close_variant_resources(idle.pop(0))
+
+    def close_variant_resources(self, key: Tuple[str, str | None]):
+        """Close an open variant database and forget it."""
+        task = self.variant_resources.pop(key)
+        del self.variant_users[key]
+        if task.done() and not task.exception():
+            print(f"Closing variant database: {key[0]}")
+            task.result().close()
+
+    def close(self):
+        """Close all open variant databases."""
+        for key in list(self.variant_resources):
+            self.close_variant_resources(key)
+
+    async def run_case(self, request: Dict[str, Any]) -> str:
+        """Run the workflow for one submitted case and return its report."""
+        variant_db = Path(request["variant_db"])
+        if not variant_db.exists():
+            raise FileNotFoundError(f"File not found: {variant_db}")
+        case_id = request.get("case_id")
+        variant_resources = self.acquire_variant_resources(variant_db, case_id)
+        try:
+            return await run_workflow(
+                request["symptoms"],
+                self.hpo_resources,
+                self.gene_resources,
+                variant_resources,
+            )
+        finally:
+            self.release_variant_resources(variant_db, case_id)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Read one JSON case request, run it and reply with one JSON line."""
+        start = time.perf_counter()
+        try:
+            request = json.loads(await reader.readline())
+            print(f"Case received: {request['variant_db']}")
+            response = {"output": await self.run_case(request)}
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f"Case failed: {e}")
+            response = {"error": f"{type(e).__name__}: {e}"}
+        print(f"Case finished in {time.perf_counter() - start:.1f} s")
+        writer.write(json.dumps(response).encode("utf-8") + b"\n")
+        await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+
+
+async def main():
+    """Load the shared resources and serve cases until interrupted."""
+    args = parse_args()
+    socket_path = args.socket.expanduser().resolve()
+
+    start = time.perf_counter()
+    hpo_resources, gene_resources = await asyncio.gather(
+        asyncio.to_thread(
+            HPOAgentResources,
+            index_json=args.hpo_db.expanduser().resolve(),
+            prompt_file=BASE_DIR / "prompts/hpo_agent.md",
+        ),
+        asyncio.to_thread(
+            GeneAgentResources,
+            phenotypes_to_gene_file=args.phenotypes_to_gene_file.expanduser().resolve(),
+            prompt_file=BASE_DIR / "prompts/gene_agent.md",
+        ),
+    )
+    print(f"Resources loaded in {time.perf_counter() - start:.1f} s")
+
+    workflow_server = WorkflowServer(
+        hpo_resources,
+        gene_resources,
+        args.query_cache_size,
+        args.variant_backend,
+        max(args.max_open_databases, 1),
+    )
+    socket_path.unlink(missing_ok=True)
+    # Cases can run for minutes; allow large requests and replies
+    server = await asyncio.start_unix_server(
+        workflow_server.handle, path=str(socket_path), limit=2**24
+    )
+    print(f"Listening on {socket_path}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        socket_path.unlink(missing_ok=True)
+        workflow_server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
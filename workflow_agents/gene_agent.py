@@ -4,6 +4,7 @@ from pathlib import Path
 import pandas as pd
 from pydantic import BaseModel
 from agents import Agent, ModelSettings, function_tool, RunContextWrapper
+from workflow_agents.query_cache import database_fingerprint
 
 
 class GeneAgentResources:
@@ -17,6 +18,7 @@ class GeneAgentResources:
             ["hpo_id", "gene_symbol"]
         ]
         self.phenotypes_to_gene_df = self.phenotypes_to_gene_df.drop_duplicates()
+        self.fingerprint = database_fingerprint(phenotypes_to_gene_file)
         print("Gene resources loaded successfully.")
 
     def associated_genes(self, hpo_ids: list[str], max_genes=30) -> pd.DataFrame:
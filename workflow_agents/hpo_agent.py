@@ -7,6 +7,7 @@ from sentence_transformers import SentenceTransformer
 import hnswlib
 from agents import Agent, ModelSettings, function_tool, RunContextWrapper
 from pydantic import BaseModel
+from workflow_agents.query_cache import database_fingerprint
 
 
 class HPOAgentResources:
@@ -21,6 +22,9 @@ class HPOAgentResources:
             index_info = json.load(f)
 
         index_file = str(index_json.parent / index_info.get("index_file", "index.bin"))
+        self.fingerprint = json.dumps(
+            [database_fingerprint(index_json), database_fingerprint(Path(index_file))]
+        )
 
         self.term_texts = index_info["term_texts"]
         self.index = hnswlib.Index(
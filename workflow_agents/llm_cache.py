@@ -0,0 +1,187 @@
+"""On-disk cache of model responses for the agents Runner"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, AsyncIterator, List
+from pydantic import BaseModel, TypeAdapter
+from openai.types.responses import ResponseOutputItem
+from agents import (
+    AgentOutputSchemaBase,
+    Handoff,
+    Model,
+    ModelProvider,
+    ModelResponse,
+    ModelSettings,
+    ModelTracing,
+    MultiProvider,
+    Tool,
+    TResponseInputItem,
+    Usage,
+)
+
+OUTPUT_ITEMS = TypeAdapter(List[ResponseOutputItem])
+
+
+class ReplayCacheMiss(RuntimeError):
+    """A model call in replay mode had no cached response."""
+
+
+def json_default(obj: Any) -> Any:
+    """Serialize the pydantic models that can appear in model inputs."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(exclude_unset=True)
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+
+def tool_schema(tool: Tool) -> Any:
+    """The part of a tool the model sees."""
+    schema = getattr(tool, "params_json_schema", None)
+    return [tool.name, getattr(tool, "description", None), schema]
+
+
+class CachedModel(Model):
+    """
+    Model that answers from the cache when it has seen the exact same request:
+    model, instructions, message history (including tool results), settings,
+    tools and output schema. Other requests go to the wrapped model and are
+    saved, unless replaying, where they fail instead.
+    """
+
+    def __init__(
+        self,
+        model_name: str | None,
+        provider: ModelProvider,
+        cache_dir: Path,
+        replay: bool,
+    ):
+        self.model_name = model_name
+        self.provider = provider
+        self.cache_dir = cache_dir
+        self.replay = replay
+        self._model: Model | None = None
+
+    @property
+    def model(self) -> Model:
+        """The wrapped model, created on the first cache miss."""
+        if self._model is None:
+            self._model = self.provider.get_model(self.model_name)
+        return self._model
+
+    def cache_key(
+        self,
+        system_instructions: str | None,
+        input: str | list[TResponseInputItem],  # pylint: disable=redefined-builtin
+        model_settings: ModelSettings,
+        tools: list[Tool],
+        output_schema: AgentOutputSchemaBase | None,
+        handoffs: list[Handoff],
+    ) -> str:
+        """Hash everything that determines the model's response."""
+        request = {
+            "model": self.model_name,
+            "instructions": system_instructions,
+            "input": input,
+            "model_settings": model_settings.to_json_dict(),
+            "tools": [tool_schema(tool) for tool in tools],
+            "output_schema": output_schema.json_schema() if output_schema else None,
+            "handoffs": [[h.tool_name, h.input_json_schema] for h in handoffs],
+        }
+        encoded = json.dumps(request, sort_keys=True, default=json_default)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    async def get_response(
+        self,
+        system_instructions: str | None,
+        input: str | list[TResponseInputItem],  # pylint: disable=redefined-builtin
+        model_settings: ModelSettings,
+        tools: list[Tool],
+        output_schema: AgentOutputSchemaBase | None,
+        handoffs: list[Handoff],
+        tracing: ModelTracing,
+        *,
+        previous_response_id: str | None,
+        conversation_id: str | None,
+        prompt: Any | None,
+    ) -> ModelResponse:
+        key = self.cache_key(
+            system_instructions, input, model_settings, tools, output_schema, handoffs
+        )
+        path = self.cache_dir / key[:2] / f"{key}.json"
+        if path.is_file():
+            cached = json.loads(path.read_text(encoding="utf-8"))
+            # Cached calls cost nothing, so report no usage for them
+            return ModelResponse(
+                output=OUTPUT_ITEMS.validate_python(cached["output"]),
+                usage=Usage(),
+                response_id=cached["response_id"],
+            )
+        if self.replay:
+            raise ReplayCacheMiss(
+                f"No cached response for a {self.model_name} call (key {key})"
+            )
+
+        response = await self.model.get_response(
+            system_instructions,
+            input,
+            model_settings,
+            tools,
+            output_schema,
+            handoffs,
+            tracing,
+            previous_response_id=previous_response_id,
+            conversation_id=conversation_id,
+            prompt=prompt,
+        )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        cached = {
+            "model": self.model_name,
+            "output": OUTPUT_ITEMS.dump_python(response.output, mode="json"),
+            "response_id": response.response_id,
+        }
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(cached), encoding="utf-8")
+        tmp_path.replace(path)
+        return response
+
+    def stream_response(
+        self,
+        system_instructions: str | None,
+        input: str | list[TResponseInputItem],  # pylint: disable=redefined-builtin
+        model_settings: ModelSettings,
+        tools: list[Tool],
+        output_schema: AgentOutputSchemaBase | None,
+        handoffs: list[Handoff],
+        tracing: ModelTracing,
+        *,
+        previous_response_id: str | None,
+        conversation_id: str | None,
+        prompt: Any | None,
+    ) -> AsyncIterator[Any]:
+        # The workflow does not stream; streamed calls bypass the cache
+        if self.replay:
+            raise ReplayCacheMiss("Streamed model calls cannot be replayed")
+        return self.model.stream_response(
+            system_instructions,
+            input,
+            model_settings,
+            tools,
+            output_schema,
+            handoffs,
+            tracing,
+            previous_response_id=previous_response_id,
+            conversation_id=conversation_id,
+            prompt=prompt,
+        )
+
+
+class CachingModelProvider(ModelProvider):
+    """Model provider whose models answer from an on-disk response cache."""
+
+    def __init__(self, cache_dir: Path, replay: bool = False):
+        self.cache_dir = cache_dir
+        self.replay = replay
+        self.provider = MultiProvider()
+
+    def get_model(self, model_name: str | None) -> Model:
+        return CachedModel(model_name, self.provider, self.cache_dir, self.replay)
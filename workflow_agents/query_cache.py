@@ -0,0 +1,111 @@
+"""Cache of formatted variant query results"""
+
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+
+def database_fingerprint(database_file: Path, case_id: str | None = None) -> str:
+    """
+    Identify the contents of a variant database by path, size and modification
+    time, so cached results are dropped once the database is reloaded. A
+    Parquet directory is fingerprinted by the files of the case's partitions,
+    or by all of its files when no case is given.
+    """
+    if database_file.is_dir() and case_id is not None:
+        files = sorted(database_file.glob(f"*/case_id={case_id}/**/*.parquet"))
+    elif database_file.is_dir():
+        files = sorted(database_file.rglob("*.parquet"))
+    else:
+        files = [database_file]
+    stats = [(str(f), f.stat().st_size, f.stat().st_mtime_ns) for f in files]
+    return json.dumps([str(database_file.resolve()), case_id, stats])
+
+
+class QueryCache:
+    """
+    LRU cache of formatted tool output, keyed by tool name and normalized
+    filters. Entries are only reused for the database they were computed on;
+    an optional cache file carries them across runs.
+    """
+
+    def __init__(
+        self,
+        fingerprint: str,
+        max_entries: int = 1024,
+        cache_file: Path | None = None,
+    ):
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.cache_file = cache_file
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_file is not None and cache_file.is_file() and max_entries > 0:
+            self.load()
+
+    @staticmethod
+    def make_key(tool: str, **filters: Any) -> str:
+        """
+        Normalize tool arguments into a cache key. List filters match any of
+        their values, so their order does not change the result.
+        """
+        normalized: Dict[str, Any] = {}
+        for name, value in sorted(filters.items()):
+            if name in ("clinvar", "consequence") and value:
+                value = sorted(set(value))
+            elif isinstance(value, (list, tuple)):
+                value = list(value)
+            normalized[name] = value
+        return json.dumps([tool, normalized], sort_keys=True)
+
+    def get(self, key: str) -> str | None:
+        """Return the cached text for a key, or None, counting hits and misses."""
+        with self._lock:
+            text = self._entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key: str, text: str):
+        """Store the text for a key, evicting the least recently used entry."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Tuple[int, int]:
+        """Return the (hits, misses) counters."""
+        return self.hits, self.misses
+
+    def load(self):
+        """Load entries saved for the same database fingerprint."""
+        data = json.loads(self.cache_file.read_text(encoding="utf-8"))
+        if data.get("fingerprint") != self.fingerprint:
+            print(f"Ignoring query cache for a different database: {self.cache_file}")
+            return
+        for key, text in data["entries"][-self.max_entries :]:
+            self._entries[key] = text
+        print(f"Loaded {len(self._entries)} cached variant queries.")
+
+    def save(self):
+        """Write the entries to the cache file, if one was given."""
+        if self.cache_file is None:
+            return
+        with self._lock:
+            data = {
+                "fingerprint": self.fingerprint,
+                "entries": list(self._entries.items()),
+            }
+        tmp_file = self.cache_file.with_suffix(self.cache_file.suffix + ".tmp")
+        tmp_file.write_text(json.dumps(data), encoding="utf-8")
+        tmp_file.replace(self.cache_file)
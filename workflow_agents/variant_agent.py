@@ -1,92 +1,999 @@
 """Variant Agent"""
 
 import asyncio
+import base64
+import threading
+import time
 import warnings
 import json
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Literal, Tuple, get_args
 from dataclasses import dataclass
 from sqlalchemy import (
+    ARRAY,
+    String,
     create_engine,
+    event,
     MetaData,
     Table,
+    Select,
+    Subquery,
+    and_,
+    or_,
+    bindparam,
+    case,
+    cast,
+    column,
+    exists,
     select,
     func,
+    table,
     exc as sa_exc,
 )
+from sqlalchemy.dialects import postgresql
 from duckdb_engine import DuckDBEngineWarning
+import duckdb
 import pandas as pd
 from agents import Agent, ModelSettings, function_tool, RunContextWrapper
+from workflow_agents.query_cache import QueryCache, database_fingerprint
+from workflow_agents.variant_summary import clinvar_summary, transcripts_summary
 
 warnings.simplefilter("ignore", sa_exc.SAWarning)
 warnings.simplefilter("ignore", DuckDBEngineWarning)
 
 
+# Per-sample columns of the variants table that cohort databases keep in
+# the genotypes table instead.
+GENOTYPE_COLUMNS = {
+    "genotype",
+    "genotype_quality",
+    "total_depth",
+    "allele_depths",
+    "maternal_genotype",
+    "paternal_genotype",
+}
+
+
+# Tables exported by add-variants.py --parquet-dir, one directory each, with
+# their Hive partition columns.
+PARQUET_TABLES = {
+    "variants": ["case_id", "chromosome"],
+    "variant_genes": ["case_id", "chromosome"],
+    "variant_consequences": ["case_id", "chromosome"],
+    "clinvar_classifications": ["case_id", "chromosome"],
+    "variant_summaries": ["case_id", "chromosome"],
+    "gene_variant_summary": ["case_id"],
+}
+
+# Variant classes counted per gene in gene_variant_summary, in display order.
+RARE_DAMAGING_CLASSES = ["lof", "missense_inframe"]
+RARE_AF_BUCKETS = ["absent", "<0.001", "0.001-0.01"]
+SUMMARY_DIMENSIONS = {
+    "consequence_class": "Consequence",
+    "clinvar_class": "ClinVar",
+    "af_bucket": "gnomAD AF",
+}
+
+
+# Columns that order query results; the last row's values form the page cursor.
+CURSOR_COLUMNS = ["chromosome", "begin_pos", "variant_index", "vid"]
+
+# Ways to run variant queries: SQLAlchemy + duckdb_engine + pandas, or native
+# DuckDB cursors.
+BACKENDS = ["sqlalchemy", "duckdb"]
+
+
+# Inheritance patterns query_variants can filter on, evaluated from the
+# proband's and parents' genotypes.
+Inheritance = Literal["de_novo", "homozygous_recessive", "x_linked", "compound_het"]
+INHERITANCE_MODES = list(get_args(Inheritance))
+
+X_CHROMOSOMES = ["chrX", "X"]
+
+# Number of match counts kept for cursor pages of earlier queries.
+TOTALS_CACHE_SIZE = 1024
+
+
+# Genotypes are stored unphased ("0/1", "1/1", "1" when hemizygous) with no-calls
+# read as reference, so each test is a pattern on the genotype string.
+def carries_alt(genotype):
+    """True if the genotype has at least one alternate allele."""
+    return func.regexp_matches(genotype, "[1-9]")
+
+
+def is_hom_ref(genotype):
+    """True if the genotype was called and has no alternate allele."""
+    return and_(genotype.is_not(None), ~carries_alt(genotype))
+
+
+def is_het(genotype):
+    """True if the genotype has two different alleles."""
+    return and_(
+        func.regexp_matches(genotype, "^[0-9]+/[0-9]+$"),
+        func.split_part(genotype, "/", 1) != func.split_part(genotype, "/", 2),
+    )
+
+
+def is_hom_alt(genotype):
+    """True if the genotype has two copies of the same alternate allele."""
+    return and_(
+        func.regexp_matches(genotype, "^[0-9]+/[0-9]+$"),
+        func.split_part(genotype, "/", 1) == func.split_part(genotype, "/", 2),
+        carries_alt(genotype),
+    )
+
+
+def is_hemizygous(genotype):
+    """True if the genotype is a single alternate allele."""
+    return func.regexp_matches(genotype, "^[0-9]*[1-9][0-9]*$")
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Encode the sort key of the last row on a page as an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def row_cursor(row: Dict[str, Any]) -> str:
+    """The cursor of a result row, for continuing a query after it."""
+    return encode_cursor(
+        [
+            row["chromosome"],
+            int(row["begin_pos"]),
+            int(row["variant_index"]),
+            row["vid"],
+        ]
+    )
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decode a cursor into `after_<column>` bind parameter values."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(values, list) or len(values) != len(CURSOR_COLUMNS):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return {f"after_{name}": value for name, value in zip(CURSOR_COLUMNS, values)}
+
+
+def parquet_case_ids(parquet_dir: Path) -> List[str]:
+    """Case IDs with a variants partition in a Parquet directory."""
+    return sorted(
+        path.name.split("=", 1)[1]
+        for path in (parquet_dir / "variants").glob("case_id=*")
+    )
+
+
+def sql_literal(value: str) -> str:
+    """Quote a string as a SQL literal."""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def scanned_columns(node: Dict[str, Any]) -> List[str]:
+    """Columns read by the table scans in a node of a DuckDB JSON plan."""
+    columns = []
+    extra_info = node.get("extra_info")
+    if "SCAN" in node.get("name", "") and isinstance(extra_info, dict):
+        projections = extra_info.get("Projections", [])
+        columns.extend([projections] if isinstance(projections, str) else projections)
+    for child in node.get("children", []):
+        columns.extend(scanned_columns(child))
+    return columns
+
+
+def aggregates_over_column(node: Dict[str, Any], column: str) -> List[str]:
+    """
+    Return the names of the DISTINCT and GROUP BY operators in a DuckDB JSON
+    plan that have a scan of `column` beneath them. Aggregates refer to their
+    inputs by position, so the column is looked up in the scans they read.
+    """
+    found = []
+    name = node.get("name", "")
+    if ("GROUP_BY" in name or "DISTINCT" in name) and column in scanned_columns(node):
+        found.append(name)
+    for child in node.get("children", []):
+        found.extend(aggregates_over_column(child, column))
+    return found
+
+
+@dataclass
+class VariantQueryResults:
+    """Class to hold variant query results."""
+
+    variants: List[Dict[str, Any]]
+    total_variants: int
+
+
 class VariantAgentResources:
     """Class to hold Variant Agent resources."""
 
-    def __init__(self, database_file: Path, prompt_file: Path):
+    def __init__(
+        self,
+        database_file: Path,
+        prompt_file: Path,
+        case_id: str | None = None,
+        backend: str = "sqlalchemy",
+        cache_size: int = 1024,
+        cache_file: Path | None = None,
+    ):
         print("Loading Variant resources...")
+        # Views over several cases would repeat shared variants once per case
+        if (
+            case_id is None
+            and database_file.is_dir()
+            and len(parquet_case_ids(database_file)) > 1
+        ):
+            raise ValueError(
+                f"{database_file} holds several cases; a case_id is required"
+            )
         self.prompt = prompt_file.read_text(encoding="utf-8")
+        self.case_id = case_id
+        self.backend = backend
+        self.cache = QueryCache(
+            database_fingerprint(database_file, case_id), cache_size, cache_file
+        )
         print("Variant resources loaded successfully.")
 
-        database_url = f"duckdb:///{database_file}?access_mode=READ_ONLY"
-        self.engine = create_engine(database_url)
+        # Parquet store: partitioned files already hold one case's calls
+        self.cohort = case_id is not None and not database_file.is_dir()
+        if backend == "duckdb":
+            self.engine = None
+            if database_file.is_dir():
+                self.native_conn = duckdb.connect()
+                self.create_parquet_views(self.native_conn, database_file)
+            else:
+                self.native_conn = duckdb.connect(str(database_file), read_only=True)
+            # One cursor per worker thread, created on first use
+            self._cursors = threading.local()
+            self._dialect = postgresql.dialect(paramstyle="qmark")
+            self._compiled: Dict[int, Tuple[str, List[str], Dict[str, Any]]] = {}
+        elif database_file.is_dir():
+            self.engine = create_engine("duckdb:///:memory:")
+            event.listen(
+                self.engine,
+                "connect",
+                lambda dbapi_conn, _: self.create_parquet_views(
+                    dbapi_conn, database_file
+                ),
+            )
+        else:
+            database_url = f"duckdb:///{database_file}?access_mode=READ_ONLY"
+            self.engine = create_engine(database_url)
+        self._metadata = MetaData()
+
+        # Shared cohort variants have no genotypes of their own
+        if (
+            case_id is None
+            and not database_file.is_dir()
+            and self.reflect_table("genotypes", False) is not None
+        ):
+            self.close()
+            raise ValueError(
+                f"{database_file} is a cohort database; a case_id is required"
+            )
+
+        # Reflect the schema once; every tool call reuses these tables
+        if self.cohort:
+            self.variants = self.case_variants(
+                self.reflect_table("variants"), self.reflect_table("genotypes")
+            )
+        else:
+            self.variants = self.reflect_table("variants")
+        self.variant_genes = self.reflect_table("variant_genes")
+        self.variant_consequences = self.reflect_table("variant_consequences")
+        self.clinvar_classifications = self.reflect_table("clinvar_classifications")
+        # None for databases loaded before summaries were precomputed
+        self.variant_summaries = self.reflect_table("variant_summaries", False)
+        self.gene_variant_summary = self.reflect_table("gene_variant_summary", False)
+        self._statements: Dict[Tuple[bool, ...], Tuple[Select, Select]] = {}
+        # Match counts by filter values, so cursor pages need not recount
+        self._totals: Dict[str, int] = {}
+        self._batch_statements: Dict[Tuple[bool, ...], Select] = {}
+        self._gene_summary_statement: Select | None = None
+
+    def reflect_table(self, name: str, required: bool = True):
+        """
+        Return a table object for `name`, or None if it is missing and not
+        required. The native backend only needs column names, so it builds a
+        lightweight table clause from the result description.
+        """
+        if self.backend == "duckdb":
+            try:
+                description = (
+                    self.cursor().execute(f"SELECT * FROM {name} LIMIT 0").description
+                )
+            except duckdb.CatalogException:
+                if required:
+                    raise
+                return None
+            return table(name, *(column(d[0]) for d in description))
+        try:
+            with self.engine.connect() as conn:
+                return Table(name, self._metadata, autoload_with=conn)
+        except sa_exc.NoSuchTableError:
+            if required:
+                raise
+            return None
+
+    def close(self):
+        """
+        Release the database. DuckDB does not allow the two backends to hold the
+        same file open at once in one process.
+        """
+        if self.backend == "duckdb":
+            self.native_conn.close()
+        else:
+            self.engine.dispose()
+
+    def cursor(self) -> duckdb.DuckDBPyConnection:
+        """Return this thread's read-only native DuckDB cursor."""
+        if not hasattr(self._cursors, "cursor"):
+            self._cursors.cursor = self.native_conn.cursor()
+        return self._cursors.cursor
+
+    def native_sql(
+        self, statement: Select, params: Dict[str, Any]
+    ) -> Tuple[str, List[Any]]:
+        """Return a statement's SQL and positional parameters for native DuckDB."""
+        compiled = self._compiled.get(id(statement))
+        if compiled is None:
+            sql = statement.compile(dialect=self._dialect)
+            compiled = (str(sql), list(sql.positiontup), dict(sql.params))
+            self._compiled[id(statement)] = compiled
+        sql_text, names, defaults = compiled
+        return sql_text, [params[n] if n in params else defaults[n] for n in names]
+
+    def explain(
+        self, statement: Select, params: Dict[str, Any], json_format: bool = False
+    ) -> str:
+        """Return DuckDB's physical plan for a statement (native backend only)."""
+        sql_text, values = self.native_sql(statement, params)
+        explain = "EXPLAIN (FORMAT JSON) " if json_format else "EXPLAIN "
+        rows = self.cursor().execute(explain + sql_text, values).fetchall()
+        return "\n".join(row[1] for row in rows)
+
+    def execute(self, statement: Select, params: Dict[str, Any]) -> List[Dict]:
+        """Run a statement on the configured backend and return its rows."""
+        if self.backend == "duckdb":
+            sql_text, values = self.native_sql(statement, params)
+            result = self.cursor().execute(sql_text, values)
+            columns = [d[0] for d in result.description]
+            return [dict(zip(columns, row)) for row in result.fetchall()]
+
+        with self.engine.connect() as conn:
+            df = pd.read_sql_query(statement, conn, params=params)
+        return df.to_dict("records")
+
+    def query(
+        self, filters: Dict[str, Any], inheritance: str | None = None
+    ) -> VariantQueryResults:
+        """
+        Run a variant query. `filters` holds the bind parameter values: limit
+        and offset, plus any of gene, clinvar, consequence, max_gnomad_freq and
+        the decoded cursor. `inheritance` is one of INHERITANCE_MODES.
+        """
+        has_cursor = "after_vid" in filters
+        count_statement, rows_statement = self.variant_statements(
+            "gene" in filters,
+            "clinvar" in filters,
+            "consequence" in filters,
+            "max_gnomad_freq" in filters,
+            has_cursor,
+            inheritance,
+        )
+        totals_key = json.dumps(
+            [
+                inheritance,
+                {
+                    name: value
+                    for name, value in filters.items()
+                    if name not in ("limit", "offset")
+                    and not name.startswith("after_")
+                },
+            ],
+            sort_keys=True,
+        )
+        rows = self.execute(rows_statement, filters)
+        if rows and not has_cursor:
+            total_variants = int(rows[0]["total_variants"])
+        elif totals_key in self._totals:
+            total_variants = self._totals[totals_key]
+        elif filters["offset"] > 0 or filters["limit"] <= 0 or has_cursor:
+            # No window count to read the total from: count the matches once
+            total_variants = self.execute(count_statement, filters)[0]["count"]
+        else:
+            # An empty first page means nothing matches
+            total_variants = 0
+        if len(self._totals) >= TOTALS_CACHE_SIZE:
+            self._totals.pop(next(iter(self._totals)))
+        self._totals[totals_key] = total_variants
+        return VariantQueryResults(variants=rows, total_variants=total_variants)
+
+    def variant_statements(
+        self,
+        has_gene: bool,
+        has_clinvar: bool,
+        has_consequence: bool,
+        has_max_gnomad_freq: bool,
+        has_cursor: bool = False,
+        inheritance: str | None = None,
+    ) -> Tuple[Select, Select]:
+        """
+        Return the (count, rows) statements for a combination of filters. Filter
+        values are bind parameters, so each combination is built once and reused
+        with new values on every call. The rows statement fetches only the
+        requested page, along with the total number of matches. With a cursor,
+        the page starts after the cursor's sort key instead of at an offset, and
+        the total is left to the count statement.
+        """
+        key = (
+            has_gene,
+            has_clinvar,
+            has_consequence,
+            has_max_gnomad_freq,
+            has_cursor,
+            inheritance,
+        )
+        if key in self._statements:
+            return self._statements[key]
+
+        variants = self.variants
+        var_genes = self.variant_genes
+
+        # Filters are semi-joins, so each variant matches at most once and the
+        # page never needs deduplicating
+        query = select(
+            variants.c.vid,
+            variants.c.chromosome,
+            variants.c.begin_pos,
+            variants.c.variant_index,
+        )
+
+        if has_gene:
+            query = query.where(
+                self.has_mapping(
+                    var_genes, var_genes.c.gene_symbol == bindparam("gene")
+                )
+            )
+
+        query = self.apply_filters(
+            query,
+            has_clinvar,
+            has_consequence,
+            has_max_gnomad_freq,
+            inheritance,
+            bindparam("gene") if has_gene else None,
+        )
+
+        matches = query.subquery("matches")
+        count_statement = select(func.count().label("count")).select_from(matches)
+
+        order_cols = [variants.c[name] for name in CURSOR_COLUMNS]
+        if has_cursor:
+            # Row-value comparison (sort key) > (cursor), spelled out. It sits
+            # with the filters, so a page reads only the matches after the
+            # cursor and nothing counts the ones before it.
+            after = order_cols[-1] > bindparam(f"after_{CURSOR_COLUMNS[-1]}")
+            for col, name in reversed(list(zip(order_cols, CURSOR_COLUMNS))[:-1]):
+                after = or_(
+                    col > bindparam(f"after_{name}"),
+                    and_(col == bindparam(f"after_{name}"), after),
+                )
+            query = query.where(after)
+        else:
+            # The window count is taken over every match before LIMIT and
+            # OFFSET apply, so the total comes back with the page
+            query = query.add_columns(func.count().over().label("total_variants"))
+        page = (
+            query.order_by(*order_cols)
+            .limit(bindparam("limit"))
+            .offset(bindparam("offset"))
+            .subquery("page")
+        )
+        rows_statement = self.page_rows(page).order_by(
+            *(page.c[name] for name in CURSOR_COLUMNS)
+        )
+
+        self._statements[key] = (count_statement, rows_statement)
+        return self._statements[key]
+
+    def apply_filters(
+        self,
+        query: Select,
+        has_clinvar: bool,
+        has_consequence: bool,
+        has_max_gnomad_freq: bool,
+        inheritance: str | None = None,
+        gene_match=None,
+    ) -> Select:
+        """
+        Add the ClinVar, consequence, gnomAD and inheritance filters shared by
+        all queries. `gene_match` restricts compound heterozygous pairs to the
+        queried gene.
+        """
+        variants = self.variants
+        var_consequences = self.variant_consequences
+        clinvar_classifications = self.clinvar_classifications
+
+        # List filters are bound as a single VARCHAR[] value, which both
+        # backends pass straight through to DuckDB
+        if has_clinvar:
+            query = query.where(
+                self.has_mapping(
+                    clinvar_classifications,
+                    func.list_contains(
+                        cast(bindparam("clinvar"), ARRAY(String)),
+                        clinvar_classifications.c.classification,
+                    ),
+                )
+            )
+
+        if has_consequence:
+            query = query.where(
+                self.has_mapping(
+                    var_consequences,
+                    func.list_contains(
+                        cast(bindparam("consequence"), ARRAY(String)),
+                        var_consequences.c.consequence,
+                    ),
+                )
+            )
+
+        if has_max_gnomad_freq:
+            query = query.where(variants.c.gnomad_af <= bindparam("max_gnomad_freq"))
+
+        proband = variants.c.genotype
+        mother = variants.c.maternal_genotype
+        father = variants.c.paternal_genotype
+        if inheritance == "de_novo":
+            query = query.where(
+                carries_alt(proband), is_hom_ref(mother), is_hom_ref(father)
+            )
+        elif inheritance == "homozygous_recessive":
+            # Parents, when called, are carriers rather than affected
+            query = query.where(
+                is_hom_alt(proband),
+                or_(mother.is_(None), ~is_hom_alt(mother)),
+                or_(father.is_(None), ~is_hom_alt(father)),
+            )
+        elif inheritance == "x_linked":
+            # Plain comparisons rather than IN, whose expanding parameter the
+            # precompiled native statements cannot bind
+            query = query.where(
+                or_(*(variants.c.chromosome == name for name in X_CHROMOSOMES)),
+                or_(is_hemizygous(proband), is_hom_alt(proband)),
+                or_(father.is_(None), ~carries_alt(father)),
+            )
+        elif inheritance == "compound_het":
+            hits = self.compound_het_hits(
+                has_clinvar, has_consequence, has_max_gnomad_freq
+            )
+            condition = None
+            if gene_match is not None:
+                condition = hits.c.gene_symbol == gene_match
+            query = query.where(self.has_mapping(hits, condition))
+        elif inheritance is not None:
+            raise ValueError(f"Unknown inheritance mode: {inheritance}")
+        return query
+
+    def has_mapping(self, mapping, condition=None):
+        """
+        EXISTS test for a row of a mapping table (or subquery keyed by vid and
+        chromosome) that belongs to the variant and meets `condition`.
+        """
+        variants = self.variants
+        on = and_(
+            mapping.c.vid == variants.c.vid,
+            mapping.c.chromosome == variants.c.chromosome,
+        )
+        if condition is not None:
+            on = and_(on, condition)
+        return exists().where(on)
+
+    def compound_het_hits(
+        self, has_clinvar: bool, has_consequence: bool, has_max_gnomad_freq: bool
+    ) -> Subquery:
+        """
+        Heterozygous variants that form a compound heterozygous pair within a
+        gene: the filtered heterozygous hits are grouped by gene, and a gene
+        qualifies with at least one maternally and one paternally inherited
+        hit. Without parental genotypes, two heterozygous hits in the gene
+        qualify, since their phase is unknown.
+        """
+        variants = self.variants
+        mother = variants.c.maternal_genotype
+        father = variants.c.paternal_genotype
+        origin = case(
+            (and_(carries_alt(mother), is_hom_ref(father)), "maternal"),
+            (and_(carries_alt(father), is_hom_ref(mother)), "paternal"),
+            (or_(mother.is_(None), father.is_(None)), "unknown"),
+        ).label("origin")
+        genes = self.distinct_genes()
+        hets = select(
+            genes.c.gene_symbol, variants.c.vid, variants.c.chromosome, origin
+        ).join(
+            genes,
+            (genes.c.vid == variants.c.vid)
+            & (genes.c.chromosome == variants.c.chromosome),
+        )
+        hets = self.apply_filters(
+            hets.where(is_het(variants.c.genotype)),
+            has_clinvar,
+            has_consequence,
+            has_max_gnomad_freq,
+        ).subquery("hets")
+        pair_genes = (
+            select(hets.c.gene_symbol)
+            .group_by(hets.c.gene_symbol)
+            .having(
+                or_(
+                    and_(
+                        func.count().filter(hets.c.origin == "maternal") > 0,
+                        func.count().filter(hets.c.origin == "paternal") > 0,
+                    ),
+                    func.count().filter(hets.c.origin == "unknown") > 1,
+                )
+            )
+            .subquery("compound_het_genes")
+        )
+        # Both parents carrying the variant, or neither, leaves its origin
+        # undetermined; such hits cannot complete a pair
+        return (
+            select(hets.c.gene_symbol, hets.c.vid, hets.c.chromosome)
+            .join(pair_genes, pair_genes.c.gene_symbol == hets.c.gene_symbol)
+            .where(hets.c.origin.is_not(None))
+            .subquery("compound_het")
+        )
+
+    def page_rows(self, page: Subquery) -> Select:
+        """
+        Join a page of variant keys back to the variants table, selecting the
+        columns displayed to the agent along with the page's extra columns.
+        """
+        variants = self.variants
+        page_columns = [c for c in page.c if c.name not in CURSOR_COLUMNS]
+        page_join = variants.join(
+            page,
+            (page.c.vid == variants.c.vid)
+            & (page.c.chromosome == variants.c.chromosome),
+        )
+        if self.variant_summaries is None:
+            return select(variants, *page_columns).select_from(page_join)
+
+        # Display text was computed at ingest; raw JSON is not needed
+        summaries = self.variant_summaries
+        return select(
+            *(c for c in variants.c if c.name != "raw"),
+            summaries.c.clinvar_summary,
+            summaries.c.transcripts_summary,
+            *page_columns,
+        ).select_from(
+            page_join.outerjoin(
+                summaries,
+                (summaries.c.vid == variants.c.vid)
+                & (summaries.c.chromosome == variants.c.chromosome),
+            )
+        )
+
+    def distinct_genes(self, condition=None) -> Subquery:
+        """
+        (vid, chromosome, gene_symbol) rows of variant_genes without repeats,
+        for joins that produce one row per variant and gene. Deduplicating the
+        narrow mapping rows keeps DISTINCT off the wide variant rows.
+        """
+        var_genes = self.variant_genes
+        genes = select(
+            var_genes.c.vid, var_genes.c.chromosome, var_genes.c.gene_symbol
+        ).distinct()
+        if condition is not None:
+            genes = genes.where(condition)
+        return genes.subquery("genes")
+
+    def gene_batch_statement(
+        self,
+        has_clinvar: bool,
+        has_consequence: bool,
+        has_max_gnomad_freq: bool,
+        inheritance: str | None = None,
+    ) -> Select:
+        """
+        Return the statement for a multi-gene query. Matches are numbered and
+        counted per gene, so one statement returns the first `limit` variants
+        of every gene in `genes` together with each gene's total.
+        """
+        key = (has_clinvar, has_consequence, has_max_gnomad_freq, inheritance)
+        if key in self._batch_statements:
+            return self._batch_statements[key]
+
+        variants = self.variants
+        genes = self.distinct_genes(
+            func.list_contains(
+                cast(bindparam("genes"), ARRAY(String)),
+                self.variant_genes.c.gene_symbol,
+            )
+        )
+        query = select(
+            genes.c.gene_symbol.label("query_gene"),
+            variants.c.vid,
+            variants.c.chromosome,
+            variants.c.begin_pos,
+            variants.c.variant_index,
+        ).join(
+            genes,
+            (genes.c.vid == variants.c.vid)
+            & (genes.c.chromosome == variants.c.chromosome),
+        )
+        query = self.apply_filters(
+            query,
+            has_clinvar,
+            has_consequence,
+            has_max_gnomad_freq,
+            inheritance,
+            genes.c.gene_symbol,
+        )
+        matches = query.subquery("matches")
+        order_cols = [matches.c[name] for name in CURSOR_COLUMNS]
+        ranked = select(
+            matches,
+            func.count().over(partition_by=matches.c.query_gene).label("gene_total"),
+            func.row_number()
+            .over(partition_by=matches.c.query_gene, order_by=order_cols)
+            .label("gene_rank"),
+        ).subquery("ranked")
+        page = (
+            select(ranked)
+            .where(ranked.c.gene_rank <= bindparam("limit"))
+            .subquery("page")
+        )
+        statement = self.page_rows(page).order_by(
+            page.c.query_gene, page.c.gene_rank
+        )
+        self._batch_statements[key] = statement
+        return statement
+
+    def query_genes(
+        self, filters: Dict[str, Any], inheritance: str | None = None
+    ) -> Dict[str, VariantQueryResults]:
+        """
+        Run a multi-gene variant query. `filters` holds the bind parameter
+        values: genes and the per-gene limit, plus any of clinvar, consequence
+        and max_gnomad_freq. Returns results for every requested gene.
+        """
+        statement = self.gene_batch_statement(
+            "clinvar" in filters,
+            "consequence" in filters,
+            "max_gnomad_freq" in filters,
+            inheritance,
+        )
+        results = {
+            gene: VariantQueryResults(variants=[], total_variants=0)
+            for gene in filters["genes"]
+        }
+        for row in self.execute(statement, filters):
+            gene_results = results[row["query_gene"]]
+            gene_results.variants.append(row)
+            gene_results.total_variants = int(row["gene_total"])
+        return results
+
+    def summarize_genes(self, genes: List[str]) -> Dict[str, List[Dict]]:
+        """
+        Return the gene_variant_summary rows of each gene: variant counts by
+        consequence class, ClinVar class and gnomAD AF bucket.
+        """
+        if self._gene_summary_statement is None:
+            summary = self.gene_variant_summary
+            statement = select(
+                summary.c.gene_symbol,
+                summary.c.consequence_class,
+                summary.c.clinvar_class,
+                summary.c.af_bucket,
+                summary.c.variant_count,
+            ).where(
+                func.list_contains(
+                    cast(bindparam("genes"), ARRAY(String)), summary.c.gene_symbol
+                )
+            )
+            if self.cohort:
+                statement = statement.where(summary.c.case_id == self.case_id)
+            self._gene_summary_statement = statement
+        results: Dict[str, List[Dict]] = {gene: [] for gene in genes}
+        for row in self.execute(self._gene_summary_statement, {"genes": genes}):
+            results[row["gene_symbol"]].append(row)
+        return results
+
+    def create_parquet_views(self, dbapi_conn, parquet_dir: Path):
+        """
+        Expose a Parquet directory written by add-variants.py as views named
+        like the DuckDB tables. Filtering on the case_id partition prunes other
+        cases' files before any are opened.
+        """
+        case_filter = (
+            f"WHERE case_id = {sql_literal(self.case_id)}" if self.case_id else ""
+        )
+        for table_name, partitions in PARQUET_TABLES.items():
+            if not (parquet_dir / table_name).is_dir():
+                continue
+            files = sql_literal(str(parquet_dir / table_name / "**" / "*.parquet"))
+            hive_types = ", ".join(f"'{name}': VARCHAR" for name in partitions)
+            dbapi_conn.execute(
+                f"""
+                CREATE VIEW {table_name} AS
+                SELECT * EXCLUDE (case_id)
+                FROM read_parquet(
+                    {files},
+                    hive_partitioning = true,
+                    hive_types = {{{hive_types}}}
+                )
+                {case_filter}
+                """
+            )
+
+    def case_variants(self, variants, genotypes) -> Subquery:
+        """
+        Variants of one case in a cohort database, shaped like the variants
+        table: the proband's call and the parents' genotypes are joined in
+        from the genotypes table.
+        """
+        proband = genotypes.alias("proband")
+        father = genotypes.alias("father")
+        mother = genotypes.alias("mother")
+
+        def sample_join(sample, role: str):
+            return and_(
+                sample.c.case_id == self.case_id,
+                sample.c.sample_role == role,
+                sample.c.vid == variants.c.vid,
+                sample.c.chromosome == variants.c.chromosome,
+            )
+
+        return (
+            select(
+                *(c for c in variants.c if c.name not in GENOTYPE_COLUMNS),
+                proband.c.genotype,
+                proband.c.genotype_quality,
+                proband.c.total_depth,
+                proband.c.allele_depths,
+                mother.c.genotype.label("maternal_genotype"),
+                father.c.genotype.label("paternal_genotype"),
+            )
+            .select_from(
+                variants.join(proband, sample_join(proband, "proband"))
+                .outerjoin(father, sample_join(father, "father"))
+                .outerjoin(mother, sample_join(mother, "mother"))
+            )
+            .subquery("case_variants")
+        )
 
     def transcripts_summary(self, variant: dict) -> str:
         """Generate a summary of transcript information for a variant."""
-        summary = ""
-        for transcript in variant.get("transcripts", []):
-            summary += (
-                f"HGNC: {transcript['hgnc']}, "
-                + f"transcript: {transcript['transcript']}, "
-                + f"consequences: {', '.join(transcript.get('consequence', []))}, "
-                + f"hgvsc: {transcript.get('hgvsc', '<none>')}\n"
-            )
-        return summary
+        return transcripts_summary(variant)
 
     def clinvar_summary(self, variant: dict) -> str:
         """Generate a summary of ClinVar information for a variant."""
-        if not variant.get("clinvar-preview"):
-            return "<no ClinVar data>"
-        summary = ""
-        for entry in variant["clinvar-preview"]:
-            germline_classification = entry.get("classifications", {}).get(
-                "germlineClassification", {}
-            )
-            diseases = filter(
-                lambda condition: condition.get("type") == "Disease",
-                germline_classification.get("conditions", []),
-            )
-            if diseases:
-                disease_list = []
-                for disease in diseases:
-                    disease_list.extend(
-                        trait.get("name", {}).get("value", "<unknown>")
-                        for trait in disease.get("traits", [])
-                    )
-            else:
-                disease_list = ["<unknown>"]
-            classification = germline_classification.get("classification", "<unknown>")
-            review_status = entry.get("reviewStatus", "<unknown>")
-            summary += (
-                f"ClinVar ID: {entry.get('accession', '<unknown>')}, "
-                + f"Reference allele: {entry.get('refAllele', '<unknown>')}, "
-                + f"Alternate allele: {entry.get('altAllele', '<unknown>')}, "
-                + f"Allele-specific: {entry.get('isAlleleSpecific', '<unknown>')}, "
-                + f"Classification: {classification}, "
-                + f"Review Status: {review_status}, "
-                + f"Diseases: {', '.join(disease_list)}"
-            )
-        return summary
+        return clinvar_summary(variant)
 
 
-@dataclass
-class VariantQueryResults:
-    """Class to hold variant query results."""
+def format_variant(row: Dict[str, Any]) -> str:
+    """Format one variant row for the agent."""
+    depth_row = (
+        f"Total Depth: {row['total_depth']}, "
+        f"Allele Depths: {row['allele_depths']}"
+    )
+    return "\n".join(
+        [
+            "<variant>",
+            f"Chromosome: {row['chromosome']}",
+            f"Position: {row['position']}",
+            f"Ref Allele: {row['ref_allele']}",
+            f"Alt Allele: {row['alt_allele']}",
+            f"Gene Symbols: {', '.join(row['gene_symbols'])}",
+            f"gnomAD AF: {row['gnomad_af']}",
+            f"ClinVar Summary: {row['clinvar_summary'] or '<no ClinVar data>'}",
+            row["transcripts_summary"] or "",
+            f"Genotype: {row['genotype']}, GQ: {row['genotype_quality']}",
+            depth_row,
+            f"Maternal Genotype: {row['maternal_genotype']}, ",
+            f"Paternal Genotype: {row['paternal_genotype']}",
+            f"Variant Type: {row['variant_type']}",
+            "</variant>\n",
+        ]
+    )
 
-    variants: pd.DataFrame
-    total_variants: int
+
+def format_variants(
+    resources: VariantAgentResources, rows: List[Dict[str, Any]]
+) -> str:
+    """Format variant rows for the agent."""
+    result_text = ""
+    for row in rows:
+        if "raw" in row:
+            # No precomputed summaries in this database: build them from raw JSON
+            raw_variant = json.loads(row["raw"])
+            row["clinvar_summary"] = resources.clinvar_summary(raw_variant)
+            row["transcripts_summary"] = resources.transcripts_summary(raw_variant)
+        result_text += format_variant(row)
+    return result_text
+
+
+async def run_variant_query(
+    resources: VariantAgentResources,
+    gene: str | None = None,
+    clinvar: List[str] | None = None,
+    consequence: List[str] | None = None,
+    max_gnomad_freq: float | None = None,
+    inheritance: Inheritance | None = None,
+    limit: int = 20,
+    offset: int = 0,
+    cursor: str | None = None,
+) -> str:
+    """Run a variant query and format the results as the query_variants tool."""
+    limit = max(limit, 1)
+    print("Querying variants with filters:")
+    if gene:
+        print(f"  Gene: {gene}")
+    if clinvar:
+        print(f"  ClinVar: {', '.join(clinvar)}")
+    if consequence:
+        print(f"  Consequence: {', '.join(consequence)}")
+    if max_gnomad_freq is not None:
+        print(f"  Max gnomAD frequency: {max_gnomad_freq}")
+    if inheritance:
+        print(f"  Inheritance: {inheritance}")
+    print(f"  Limit: {limit}, Offset: {offset}")
+    if cursor:
+        print(f"  Cursor: {cursor}")
+
+    if inheritance is not None and inheritance not in INHERITANCE_MODES:
+        raise ValueError(f"Unknown inheritance mode: {inheritance}")
+    cache_key = resources.cache.make_key(
+        "query_variants",
+        gene=gene,
+        clinvar=clinvar,
+        consequence=consequence,
+        max_gnomad_freq=max_gnomad_freq,
+        inheritance=inheritance,
+        limit=limit,
+        offset=offset,
+        cursor=cursor,
+    )
+    result_text = resources.cache.get(cache_key)
+    if result_text is not None:
+        print(f"Returning cached result (hits: {resources.cache.hits})")
+        return result_text
+
+    filters: Dict[str, Any] = {"limit": limit, "offset": max(offset, 0)}
+    if cursor:
+        filters.update(decode_cursor(cursor))
+    if gene:
+        filters["gene"] = gene
+    if clinvar:
+        filters["clinvar"] = clinvar
+    if consequence:
+        filters["consequence"] = consequence
+    if max_gnomad_freq is not None:
+        filters["max_gnomad_freq"] = max_gnomad_freq
+
+    start = time.perf_counter()
+    query_results = await asyncio.to_thread(resources.query, filters, inheritance)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(
+        f"Fetched {len(query_results.variants)} variants starting at offset {offset} "
+        f"in {elapsed_ms:.1f} ms ({resources.backend})"
+    )
+
+    result_text = format_variants(resources, query_results.variants)
+
+    page_start = "after cursor" if cursor else f"at offset {offset}"
+    result_text = (
+        f"Total variants found: {query_results.total_variants}\n"
+        + f"Displaying {len(query_results.variants)} variants {page_start}:\n"
+        + result_text
+    )
+    if len(query_results.variants) == limit:
+        next_cursor = row_cursor(query_results.variants[-1])
+        result_text += f"Next cursor: {next_cursor}\n"
+    resources.cache.put(cache_key, result_text)
+    return result_text
 
 
 @function_tool
@@ -96,8 +1003,10 @@ async def query_variants(
     clinvar: List[str] | None = None,
     consequence: List[str] | None = None,
     max_gnomad_freq: float | None = None,
+    inheritance: Inheritance | None = None,
     limit: int = 20,
     offset: int = 0,
+    cursor: str | None = None,
 ) -> str:
     """
     Fetch variants, filtered by any combination of:
@@ -107,105 +1016,201 @@ async def query_variants(
       - consequence: List of transcript consequences, at least one of which must appear
                      in the variant's transcript_consequences array
       - maximum gnomAD allele frequency
-    Supports paging via `limit` and `offset`.
+      - inheritance: de_novo (parents reference), homozygous_recessive,
+                     x_linked (hemizygous or homozygous on X, father not a
+                     carrier), or compound_het (two or more heterozygous hits
+                     in the gene, inherited from different parents)
+    Supports paging via `limit` and `cursor`: pass the `Next cursor` from the
+    previous result to get the following page. `offset` is still accepted.
     """
-    print("Querying variants with filters:")
-    if gene:
-        print(f"  Gene: {gene}")
+    return await run_variant_query(
+        wrapper.context,
+        gene=gene,
+        clinvar=clinvar,
+        consequence=consequence,
+        max_gnomad_freq=max_gnomad_freq,
+        inheritance=inheritance,
+        limit=limit,
+        offset=offset,
+        cursor=cursor,
+    )
+
+
+async def run_variant_batch_query(
+    resources: VariantAgentResources,
+    genes: List[str],
+    clinvar: List[str] | None = None,
+    consequence: List[str] | None = None,
+    max_gnomad_freq: float | None = None,
+    inheritance: Inheritance | None = None,
+    limit_per_gene: int = 20,
+) -> str:
+    """Run a multi-gene variant query and format the results grouped by gene."""
+    # Totals are read off the returned rows, so fetch at least one per gene
+    limit_per_gene = max(limit_per_gene, 1)
+    print("Querying variants in a batch of genes with filters:")
+    print(f"  Genes: {', '.join(genes)}")
     if clinvar:
         print(f"  ClinVar: {', '.join(clinvar)}")
     if consequence:
         print(f"  Consequence: {', '.join(consequence)}")
     if max_gnomad_freq is not None:
         print(f"  Max gnomAD frequency: {max_gnomad_freq}")
-    print(f"  Limit: {limit}, Offset: {offset}")
+    if inheritance:
+        print(f"  Inheritance: {inheritance}")
+    print(f"  Limit per gene: {limit_per_gene}")
 
-    def _build_and_execute_query() -> VariantQueryResults:
-        with wrapper.context.engine.connect() as conn:
-            md = MetaData()
-            variants = Table("variants", md, autoload_with=conn)
-            var_genes = Table("variant_genes", md, autoload_with=conn)
-            var_consequences = Table("variant_consequences", md, autoload_with=conn)
-            clinvar_classifications = Table(
-                "clinvar_classifications", md, autoload_with=conn
-            )
+    # Keep the caller's gene order, without repeats
+    genes = list(dict.fromkeys(genes))
+    if inheritance is not None and inheritance not in INHERITANCE_MODES:
+        raise ValueError(f"Unknown inheritance mode: {inheritance}")
+    cache_key = resources.cache.make_key(
+        "query_variants_batch",
+        genes=genes,
+        clinvar=clinvar,
+        consequence=consequence,
+        max_gnomad_freq=max_gnomad_freq,
+        inheritance=inheritance,
+        limit_per_gene=limit_per_gene,
+    )
+    result_text = resources.cache.get(cache_key)
+    if result_text is not None:
+        print(f"Returning cached result (hits: {resources.cache.hits})")
+        return result_text
 
-            query = select(variants).distinct()
+    filters: Dict[str, Any] = {"genes": genes, "limit": limit_per_gene}
+    if clinvar:
+        filters["clinvar"] = clinvar
+    if consequence:
+        filters["consequence"] = consequence
+    if max_gnomad_freq is not None:
+        filters["max_gnomad_freq"] = max_gnomad_freq
 
-            if gene:
-                query = query.join(
-                    var_genes,
-                    (var_genes.c.vid == variants.c.vid)
-                    & (var_genes.c.chromosome == variants.c.chromosome),
-                ).where(var_genes.c.gene_symbol == gene)
+    start = time.perf_counter()
+    gene_results = await asyncio.to_thread(
+        resources.query_genes, filters, inheritance
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    fetched = sum(len(r.variants) for r in gene_results.values())
+    print(
+        f"Fetched {fetched} variants in {len(genes)} genes "
+        f"in {elapsed_ms:.1f} ms ({resources.backend})"
+    )
 
-            if clinvar:
-                query = query.join(
-                    clinvar_classifications,
-                    (clinvar_classifications.c.vid == variants.c.vid)
-                    & (clinvar_classifications.c.chromosome == variants.c.chromosome),
-                ).where(clinvar_classifications.c.classification.in_(clinvar))
+    result_text = ""
+    for gene, query_results in gene_results.items():
+        result_text += (
+            f"<gene name=\"{gene}\">\n"
+            f"Total variants found: {query_results.total_variants}\n"
+            f"Displaying {len(query_results.variants)} variants:\n"
+            + format_variants(resources, query_results.variants)
+        )
+        if len(query_results.variants) < query_results.total_variants:
+            next_cursor = row_cursor(query_results.variants[-1])
+            result_text += (
+                f"More variants available: use query_variants with gene={gene}, "
+                f"the same filters and cursor={next_cursor} to get the next page.\n"
+            )
+        result_text += "</gene>\n"
+    resources.cache.put(cache_key, result_text)
+    return result_text
 
-            if consequence:
-                query = query.join(
-                    var_consequences,
-                    (var_consequences.c.vid == variants.c.vid)
-                    & (var_consequences.c.chromosome == variants.c.chromosome),
-                ).where(var_consequences.c.consequence.in_(consequence))
 
-            if max_gnomad_freq is not None:
-                query = query.where(variants.c.gnomad_af <= max_gnomad_freq)
+@function_tool
+async def query_variants_batch(
+    wrapper: RunContextWrapper[VariantAgentResources],
+    genes: List[str],
+    clinvar: List[str] | None = None,
+    consequence: List[str] | None = None,
+    max_gnomad_freq: float | None = None,
+    inheritance: Inheritance | None = None,
+    limit_per_gene: int = 20,
+) -> str:
+    """
+    Fetch variants in several genes at once, grouped by gene. The optional
+    clinvar, consequence, max_gnomad_freq and inheritance filters work as in
+    query_variants and apply to every gene. Each gene reports its total number
+    of matching variants and shows at most `limit_per_gene` of them; a gene
+    with more gives a cursor for query_variants to continue after the ones
+    shown.
+    """
+    return await run_variant_batch_query(
+        wrapper.context,
+        genes,
+        clinvar=clinvar,
+        consequence=consequence,
+        max_gnomad_freq=max_gnomad_freq,
+        inheritance=inheritance,
+        limit_per_gene=limit_per_gene,
+    )
 
-            total_variants: int = conn.execute(
-                select(func.count()).select_from(query.subquery())
-            ).scalar_one()
 
-            order_cols = [
-                variants.c.chromosome,
-                variants.c.begin_pos,
-                variants.c.variant_index,
-            ]
-            query = query.order_by(*(c.asc() for c in order_cols))
-            query = query.offset(offset)
+def format_gene_summary(gene: str, rows: List[Dict[str, Any]]) -> str:
+    """Format one gene's variant counts for the agent."""
+    total = sum(int(row["variant_count"]) for row in rows)
+    rare_damaging = sum(
+        int(row["variant_count"])
+        for row in rows
+        if row["consequence_class"] in RARE_DAMAGING_CLASSES
+        and row["af_bucket"] in RARE_AF_BUCKETS
+    )
+    pathogenic = sum(
+        int(row["variant_count"])
+        for row in rows
+        if row["clinvar_class"] == "pathogenic"
+    )
+    lines = [
+        f"<gene name=\"{gene}\">",
+        f"Variants: {total}",
+        f"Rare (gnomAD AF < 0.01) LoF/missense/inframe: {rare_damaging}",
+        f"ClinVar pathogenic/likely pathogenic: {pathogenic}",
+    ]
+    for column_name, label in SUMMARY_DIMENSIONS.items():
+        counts: Dict[str, int] = {}
+        for row in rows:
+            value = row[column_name]
+            counts[value] = counts.get(value, 0) + int(row["variant_count"])
+        if counts:
+            lines.append(
+                f"{label}: "
+                + ", ".join(f"{value} {count}" for value, count in counts.items())
+            )
+    lines.append("</gene>\n")
+    return "\n".join(lines)
 
-            df = pd.read_sql_query(query, conn)
-        return VariantQueryResults(variants=df, total_variants=total_variants)
 
-    query_results = await asyncio.to_thread(_build_and_execute_query)
-    print(f"Fetched {len(query_results.variants)} variants starting at offset {offset}")
+@function_tool
+async def summarize_gene_variants(
+    wrapper: RunContextWrapper[VariantAgentResources],
+    genes: List[str],
+) -> str:
+    """
+    Count the patient's variants in each gene without fetching them: totals,
+    rare LoF/missense/inframe variants, ClinVar pathogenic/likely pathogenic
+    variants, and breakdowns by consequence class, ClinVar class and gnomAD
+    allele frequency bucket. Use it to triage candidate genes before querying
+    variants.
+    """
+    resources = wrapper.context
+    genes = list(dict.fromkeys(genes))
+    print(f"Summarizing variants in genes: {', '.join(genes)}")
+    if resources.gene_variant_summary is None:
+        return (
+            "Gene summaries are not available for this variant database. "
+            "Use query_variants_batch instead."
+        )
 
-    # Parse JSON column
-    query_results.variants["raw"] = query_results.variants["raw"].map(json.loads)
+    cache_key = resources.cache.make_key("summarize_gene_variants", genes=genes)
+    result_text = resources.cache.get(cache_key)
+    if result_text is not None:
+        print(f"Returning cached result (hits: {resources.cache.hits})")
+        return result_text
 
-    result_text = ""
-    for row in query_results.variants.itertuples(index=False):
-        depth_row = (
-            f"Total Depth: {row.total_depth}, " f"Allele Depths: {row.allele_depths}"
-        )
-        result_text += "\n".join(
-            [
-                "<variant>",
-                f"Chromosome: {row.chromosome}",
-                f"Position: {row.position}",
-                f"Ref Allele: {row.ref_allele}",
-                f"Alt Allele: {row.alt_allele}",
-                f"Gene Symbols: {', '.join(row.gene_symbols)}",
-                f"gnomAD AF: {row.gnomad_af}",
-                f"ClinVar Summary: {wrapper.context.clinvar_summary(row.raw)}",
-                wrapper.context.transcripts_summary(row.raw),
-                f"Genotype: {row.genotype}, GQ: {row.genotype_quality}",
-                depth_row,
-                f"Maternal Genotype: {row.maternal_genotype}, ",
-                f"Paternal Genotype: {row.paternal_genotype}",
-                f"Variant Type: {row.variant_type}",
-                "</variant>\n",
-            ]
-        )
-    result_text = (
-        f"Total variants found: {query_results.total_variants}\n"
-        + f"Displaying {len(query_results.variants)} variants at offset {offset}:\n"
-        + result_text
+    summaries = await asyncio.to_thread(resources.summarize_genes, genes)
+    result_text = "".join(
+        format_gene_summary(gene, rows) for gene, rows in summaries.items()
     )
+    resources.cache.put(cache_key, result_text)
     return result_text
 
 
@@ -214,7 +1219,7 @@ def create_variant_agent(resources: VariantAgentResources) -> Agent:
     variant_agent = Agent(
         name="Variant Assistant",
         instructions=resources.prompt,
-        tools=[query_variants],
+        tools=[summarize_gene_variants, query_variants, query_variants_batch],
         model="gpt-5",
         model_settings=ModelSettings(tool_choice="required"),
     )
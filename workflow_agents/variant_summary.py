@@ -0,0 +1,52 @@
+"""Variant Summaries"""
+
+from typing import Any, Dict
+
+
+def transcripts_summary(variant: Dict[str, Any]) -> str:
+    """Generate a summary of transcript information for a variant."""
+    summary = ""
+    for transcript in variant.get("transcripts", []):
+        summary += (
+            f"HGNC: {transcript.get('hgnc', '<none>')}, "
+            + f"transcript: {transcript.get('transcript', '<none>')}, "
+            + f"consequences: {', '.join(transcript.get('consequence', []))}, "
+            + f"hgvsc: {transcript.get('hgvsc', '<none>')}\n"
+        )
+    return summary
+
+
+def clinvar_summary(variant: Dict[str, Any]) -> str:
+    """Generate a summary of ClinVar information for a variant."""
+    if not variant.get("clinvar-preview"):
+        return "<no ClinVar data>"
+    summary = ""
+    for entry in variant["clinvar-preview"]:
+        germline_classification = entry.get("classifications", {}).get(
+            "germlineClassification", {}
+        )
+        diseases = filter(
+            lambda condition: condition.get("type") == "Disease",
+            germline_classification.get("conditions", []),
+        )
+        if diseases:
+            disease_list = []
+            for disease in diseases:
+                disease_list.extend(
+                    trait.get("name", {}).get("value", "<unknown>")
+                    for trait in disease.get("traits", [])
+                )
+        else:
+            disease_list = ["<unknown>"]
+        classification = germline_classification.get("classification", "<unknown>")
+        review_status = entry.get("reviewStatus", "<unknown>")
+        summary += (
+            f"ClinVar ID: {entry.get('accession', '<unknown>')}, "
+            + f"Reference allele: {entry.get('refAllele', '<unknown>')}, "
+            + f"Alternate allele: {entry.get('altAllele', '<unknown>')}, "
+            + f"Allele-specific: {entry.get('isAlleleSpecific', '<unknown>')}, "
+            + f"Classification: {classification}, "
+            + f"Review Status: {review_status}, "
+            + f"Diseases: {', '.join(disease_list)}"
+        )
+    return summary
@@ -0,0 +1,179 @@
+"""Multi-agent workflow shared by the command line, server and batch runners"""
+
+import hashlib
+import inspect
+import json
+from pathlib import Path
+from typing import Any, Awaitable, TypeVar
+from agents import Agent, RunConfig, Runner, trace
+from workflow_agents.hpo_agent import HPOAgentResources, HPOTermList, create_hpo_agent
+from workflow_agents.gene_agent import (
+    GeneAgentResources,
+    RankedGeneList,
+    create_gene_agent,
+)
+from workflow_agents.variant_agent import VariantAgentResources, create_variant_agent
+
+T = TypeVar("T")
+
+# Workflow stages in order; --from-stage names one of these.
+STAGES = ["hpo", "gene", "variant"]
+
+
+class StageCheckpoints:
+    """
+    Stage outputs saved as JSON in a case's work directory. Each is keyed by a
+    hash of the stage's agent, input and resource files, so a saved output is
+    only reused while none of them has changed.
+    """
+
+    def __init__(
+        self, work_dir: Path, resume: bool = False, from_stage: str | None = None
+    ):
+        self.work_dir = work_dir
+        self.resume = resume
+        self.from_stage = from_stage
+
+    @staticmethod
+    def input_hash(agent: Agent, stage_input: str, *extra: str) -> str:
+        """Hash everything that determines a stage's output."""
+        digest = hashlib.sha256()
+        for part in [agent.name, str(agent.model), agent.instructions, stage_input]:
+            digest.update(str(part).encode("utf-8") + b"\0")
+        for part in extra:
+            digest.update(part.encode("utf-8") + b"\0")
+        return digest.hexdigest()
+
+    def reusable(self, stage: str) -> bool:
+        """True if a saved output of this stage may be used instead of running it."""
+        if self.from_stage is not None:
+            return STAGES.index(stage) < STAGES.index(self.from_stage)
+        return self.resume
+
+    def load(self, stage: str, input_hash: str) -> Any:
+        """Return the saved output of a stage if its inputs are unchanged."""
+        path = self.work_dir / f"{stage}.json"
+        if not self.reusable(stage) or not path.is_file():
+            return None
+        saved = json.loads(path.read_text(encoding="utf-8"))
+        if saved.get("input_hash") != input_hash:
+            return None
+        print(f"Reusing saved {stage} stage output from {path}")
+        return saved["output"]
+
+    def save(self, stage: str, input_hash: str, output: Any):
+        """Save a stage's JSON-serializable output with its input hash."""
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        path = self.work_dir / f"{stage}.json"
+        saved = {"stage": stage, "input_hash": input_hash, "output": output}
+        path.write_text(json.dumps(saved, indent=2), encoding="utf-8")
+
+
+async def resolve(resource: T | Awaitable[T]) -> T:
+    """Return a resource, waiting for it first if it is still loading."""
+    if inspect.isawaitable(resource):
+        return await resource
+    return resource
+
+
+async def run_workflow(
+    symptoms_description: str,
+    hpo_resources: HPOAgentResources | Awaitable[HPOAgentResources],
+    gene_resources: GeneAgentResources | Awaitable[GeneAgentResources],
+    variant_resources: VariantAgentResources | Awaitable[VariantAgentResources],
+    checkpoints: StageCheckpoints | None = None,
+    run_config: RunConfig | None = None,
+) -> str:
+    """
+    Run the HPO, gene and variant agents on a symptom description and return
+    the variant agent's report. Resources may be passed while still loading;
+    each stage waits only for its own. With `checkpoints`, each stage's output
+    is saved, and saved outputs with unchanged inputs are reused as allowed.
+    `run_config` is passed to every agent run.
+    """
+    hpo_resources = await resolve(hpo_resources)
+    hpo_agent = create_hpo_agent(hpo_resources)
+
+    # RunConfig only disables the traces of each agent run, not this one
+    tracing_disabled = run_config is not None and run_config.tracing_disabled
+    with trace("genomics-workflow", disabled=tracing_disabled):
+        # The terms also depend on the HPO index they were searched in
+        hpo_hash = StageCheckpoints.input_hash(
+            hpo_agent, symptoms_description, hpo_resources.fingerprint
+        )
+        saved = checkpoints.load("hpo", hpo_hash) if checkpoints else None
+        if saved is not None:
+            hpo_terms = HPOTermList.model_validate(saved)
+        else:
+            print("Starting HPO search...")
+            hpo_result = await Runner.run(
+                starting_agent=hpo_agent,
+                context=hpo_resources,
+                input=symptoms_description,
+                max_turns=20,
+                run_config=run_config,
+            )
+            hpo_terms = hpo_result.final_output_as(HPOTermList)
+            if checkpoints:
+                checkpoints.save("hpo", hpo_hash, hpo_terms.model_dump())
+        print("HPO search completed. Found terms:")
+        terms_input = ""
+        for term in hpo_terms.terms:
+            terms_input += f"{term.id}: {term.text} (Reasoning: {term.reasoning})\n"
+        print(terms_input)
+
+        gene_resources = await resolve(gene_resources)
+        gene_agent = create_gene_agent(gene_resources)
+        # The ranking also depends on the phenotype to gene table
+        gene_hash = StageCheckpoints.input_hash(
+            gene_agent, terms_input, gene_resources.fingerprint
+        )
+        saved = checkpoints.load("gene", gene_hash) if checkpoints else None
+        if saved is not None:
+            ranked_genes = RankedGeneList.model_validate(saved)
+        else:
+            print("Starting gene search...")
+            gene_result = await Runner.run(
+                starting_agent=gene_agent,
+                context=gene_resources,
+                input=terms_input,
+                run_config=run_config,
+            )
+            ranked_genes = gene_result.final_output_as(RankedGeneList)
+            if checkpoints:
+                checkpoints.save("gene", gene_hash, ranked_genes.model_dump())
+        print("Gene search completed. Ranked genes:")
+        genes_input = ""
+        for gene in ranked_genes.genes:
+            genes_input += (
+                f"Gene: {gene.gene}, "
+                f"Rank: {gene.rank}, "
+                f"Reasoning: {gene.reasoning}\n"
+            )
+        print(genes_input)
+
+        variant_resources = await resolve(variant_resources)
+        variant_agent = create_variant_agent(variant_resources)
+        variant_input = symptoms_description + "\n\nCandidate genes:\n" + genes_input
+        # The report also depends on the variants themselves
+        variant_hash = StageCheckpoints.input_hash(
+            variant_agent, variant_input, variant_resources.cache.fingerprint
+        )
+        saved = checkpoints.load("variant", variant_hash) if checkpoints else None
+        if saved is not None:
+            report = saved
+        else:
+            print("Starting variant search...")
+            variant_result = await Runner.run(
+                starting_agent=variant_agent,
+                context=variant_resources,
+                input=variant_input,
+                max_turns=20,
+                run_config=run_config,
+            )
+            report = variant_result.final_output
+            if checkpoints:
+                checkpoints.save("variant", variant_hash, report)
+        print("Variant search completed. Results:")
+        print(report)
+    return report